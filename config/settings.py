@@ -10,6 +10,7 @@ load_dotenv(BASE_DIR / ".env")
 
 DATA_DIR = BASE_DIR / "data"
 DB_PATH = DATA_DIR / "tcg_tracker.db"
+IMAGE_CACHE_DIR = DATA_DIR / "images"  # Cached card art + resized variants (see src/images.py)
 
 # API
 POKEMON_TCG_API_KEY = os.getenv("POKEMON_TCG_API_KEY", "")  # Get free key at dev.pokemontcg.io
@@ -19,5 +20,18 @@ TCGDEX_BASE_URL = "https://api.tcgdex.net/v2/en"
 # Rate limits (pokemontcg.io: 20k/day with key, 1k without)
 REQUEST_DELAY_SECONDS = 0.5  # Polite delay between API calls
 
+# Price history storage: "full" = a row per series per refresh day, "delta" = only when prices change
+# (readers forward-fill). Run scripts/compact_db.py once when switching an existing DB to delta.
+SNAPSHOT_STORAGE = os.getenv("SNAPSHOT_STORAGE", "full").lower()
+
+# Analytics: load the in-memory price cube at API startup (otherwise on first analytics request)
+PRICE_CUBE_PRELOAD = os.getenv("PRICE_CUBE_PRELOAD", "").lower() in ("1", "true", "yes")
+PRICE_CUBE_MAX_AGE_SECONDS = 300  # Top up from SQLite when older (picks up scripts/run_fetch.py writes)
+
+# Profiling: latency histograms, query counts, slow-query plans and /debug/perf (see src/perf.py)
+PERF_INSTRUMENTATION = os.getenv("PERF_INSTRUMENTATION", "").lower() in ("1", "true", "yes")
+PERF_SLOW_QUERY_MS = float(os.getenv("PERF_SLOW_QUERY_MS", "50"))
+PROFILE_DIR = DATA_DIR / "profiles"
+
 # Watchlist size
 WATCHLIST_MAX = 200
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Import historical price dumps (CSV, NDJSON or Parquet) into price_snapshots.
+
+    python scripts/backfill_prices.py dumps/tcgplayer_2023.csv --source tcgplayer
+    python scripts/backfill_prices.py dumps/cardmarket.parquet --source cardmarket --no-overwrite
+
+Interrupted imports resume from <file>.checkpoint.json; pass --restart to start over.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.backfill import BLOCK_BYTES, backfill
+from src.storage import is_delta
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--format", choices=("csv", "ndjson", "parquet"), help="Default: from file extension")
+    parser.add_argument("--source", help="Source for rows without one (tcgplayer, cardmarket)")
+    parser.add_argument("--variant", help="Variant for rows without one (default: normal)")
+    parser.add_argument("--workers", type=int, help="Parser processes (default: CPU count - 1)")
+    parser.add_argument("--block-mb", type=int, default=BLOCK_BYTES // (1024 * 1024), help="Text block size per job")
+    parser.add_argument("--no-overwrite", action="store_true", help="Keep existing rows for the same day")
+    parser.add_argument("--restart", action="store_true", help="Ignore checkpoints")
+    args = parser.parse_args()
+
+    try:
+        for f in args.files:
+            backfill(
+                f,
+                fmt=args.format,
+                source=args.source,
+                variant=args.variant,
+                workers=args.workers,
+                block_bytes=args.block_mb * 1024 * 1024,
+                overwrite=not args.no_overwrite,
+                resume=not args.restart,
+            )
+    except (FileNotFoundError, ValueError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not args.no_overwrite:
+        print("Note: a running API adds new rows to its analytics cube on its next top-up, but prices that "
+              "replaced existing rows only show in /api/analytics after an API restart.")
+    if is_delta():
+        print("Note: SNAPSHOT_STORAGE is 'delta'; run scripts/compact_db.py to drop repeated days from the import.")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Measure API import time with `python -X importtime` and guard against regressions.
+
+Fails (exit 1) if importing src.api takes longer than the budget, or pulls in a module that
+should only load when used (fetch machinery, pandas/numpy analytics, Pillow).
+
+    python scripts/bench_startup.py            # check against defaults
+    python scripts/bench_startup.py --top 20   # also list the slowest imports
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+BUDGET_MS = 700
+LAZY_MODULES = ("requests", "pandas", "numpy", "PIL", "src.fetcher", "src.cube", "src.portfolio")
+
+
+def measure(module: str) -> list[tuple[str, int, int]]:
+    """Return (module, self_us, cumulative_us) for each import, from a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+    )
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cum_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="src.api")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3, help="Best of N runs")
+    parser.add_argument("--top", type=int, default=0, help="Show the N slowest imports")
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.runs):
+        rows = measure(args.module)
+        total_ms = next(cum for name, _, cum in rows if name == args.module) / 1000
+        if best is None or total_ms < best[0]:
+            best = (total_ms, rows)
+    total_ms, rows = best
+
+    print(f"import {args.module}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms, best of {args.runs})")
+    if args.top:
+        for name, _, cum in sorted(rows, key=lambda r: -r[2])[: args.top]:
+            print(f"  {cum / 1000:8.1f} ms  {name}")
+
+    loaded = {name for name, _, _ in rows}
+    eager = [m for m in LAZY_MODULES if m in loaded]
+    failed = False
+    if eager:
+        print(f"FAIL: imported at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print("FAIL: over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""Convert price history to delta storage (drop rows that repeat the previous day) and VACUUM the DB.
+
+Set SNAPSHOT_STORAGE=delta in .env before serving a compacted DB, so readers forward-fill.
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from config.settings import DB_PATH, SNAPSHOT_STORAGE
+from src.db import get_engine, init_db
+from src.storage import compact_snapshots
+
+if __name__ == "__main__":
+    init_db()
+    before = DB_PATH.stat().st_size
+    deleted = compact_snapshots(get_engine())
+    after = DB_PATH.stat().st_size
+    print(f"Removed {deleted} unchanged snapshots. DB size: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+    if SNAPSHOT_STORAGE != "delta":
+        print("Note: SNAPSHOT_STORAGE is not 'delta'; set it in .env so the API forward-fills history.")
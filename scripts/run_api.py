@@ -1,5 +1,12 @@
 #!/usr/bin/env python3
-"""Run the FastAPI server. Reads from SQLite at data/tcg_tracker.db."""
+"""Run the FastAPI server. Reads from SQLite at data/tcg_tracker.db.
+
+Development (default): auto-reload on code changes, port 8000.
+Production (--prod): no reloader, port from $PORT, $WEB_CONCURRENCY worker processes (default 1).
+Keep one worker while /api/prices/stream is in use: the live-price broker is in-process, so
+streams only see refreshes handled by their own worker.
+"""
+import os
 import sys
 from pathlib import Path
 
@@ -9,9 +16,19 @@ sys.path.insert(0, str(ROOT))
 import uvicorn
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "src.api:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-    )
+    if "--prod" in sys.argv:
+        uvicorn.run(
+            "src.api:app",
+            host="0.0.0.0",
+            port=int(os.getenv("PORT", "8000")),
+            workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+            proxy_headers=True,
+            log_level="info",
+        )
+    else:
+        uvicorn.run(
+            "src.api:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True,
+        )
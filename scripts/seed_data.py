@@ -9,6 +9,7 @@ sys.path.insert(0, str(ROOT))
 
 from src.db import init_db, get_session
 from src.models import Card, PriceSnapshot
+from src.search import index_card
 
 SEED_CARDS = [
     {"id": "swsh4-25", "name": "Charizard", "set_id": "swsh4", "set_name": "Vivid Voltage", "number": "25", "rarity": "Rare", "supertype": "Pokémon"},
@@ -37,7 +38,8 @@ def run():
                 supertype=card_data["supertype"],
                 updated_at=today,
             )
-            session.merge(card)
+            card = session.merge(card)
+            index_card(session, card)
 
             # Seed ~30 days of fake price history (market trending slightly up)
             base_price = {"swsh4-25": 2.50, "swsh7-169": 8.00, "swsh7-170": 6.50, "swsh7-171": 7.00,
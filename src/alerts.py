@@ -0,0 +1,125 @@
+"""Price alert rules, evaluated per card right after its prices are saved."""
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from src.models import AlertEvent, AlertRule, PriceSnapshot
+from src.storage import SOURCES, latest_snapshots
+
+ALERT_KINDS = ("price_above", "price_below", "pct_move", "spread", "below_avg30")
+
+
+def _price(s: PriceSnapshot) -> Optional[float]:
+    return s.market if s.market is not None else s.mid
+
+
+def _matches(rule: AlertRule, s: PriceSnapshot) -> bool:
+    return (not rule.variant or s.variant == rule.variant) and (not rule.source or s.source == rule.source)
+
+
+def _check_price(rule: AlertRule, today_rows: list, session, day: date) -> Optional[tuple[float, str]]:
+    """Thresholds are in one currency, so a rule without a source only looks at the card's most
+    preferred source (TCGplayer when it has rows) rather than whichever row comes first."""
+    source = rule.source or next((src for src in SOURCES if any(s.source == src for s in today_rows)), None)
+    for s in today_rows:
+        p = _price(s)
+        if p is None or s.source != source or (rule.variant and s.variant != rule.variant):
+            continue
+        if rule.kind == "price_above" and p >= rule.threshold:
+            return p, f"{rule.card_id} {s.variant}/{s.source} at {p:.2f} (above {rule.threshold:.2f})"
+        if rule.kind == "price_below" and p <= rule.threshold:
+            return p, f"{rule.card_id} {s.variant}/{s.source} at {p:.2f} (below {rule.threshold:.2f})"
+    return None
+
+
+def _check_pct_move(rule: AlertRule, today_rows: list, session, day: date) -> Optional[tuple[float, str]]:
+    """Positive threshold = rise of at least N%, negative = fall of at least N%, over `days` days."""
+    days = rule.days or 7
+    # Anchor at the evaluation day, not s.snapshot_date: with delta storage the latest row can be
+    # much older than today
+    anchor = day - timedelta(days=days)
+    for s in today_rows:
+        p = _price(s)
+        if p is None or not _matches(rule, s):
+            continue
+        past = (
+            session.query(PriceSnapshot)
+            .filter(
+                PriceSnapshot.card_id == s.card_id,
+                PriceSnapshot.variant == s.variant,
+                PriceSnapshot.source == s.source,
+                PriceSnapshot.snapshot_date <= anchor,
+            )
+            .order_by(PriceSnapshot.snapshot_date.desc())
+            .first()
+        )
+        before = _price(past) if past else None
+        if not before:
+            continue
+        pct = (p - before) / before * 100
+        if (rule.threshold >= 0 and pct >= rule.threshold) or (rule.threshold < 0 and pct <= rule.threshold):
+            return pct, f"{rule.card_id} {s.variant}/{s.source} moved {pct:+.1f}% over {days}d ({before:.2f} -> {p:.2f})"
+    return None
+
+
+def _check_spread(rule: AlertRule, today_rows: list, session, day: date) -> Optional[tuple[float, str]]:
+    """TCGplayer vs CardMarket market price differ by at least `threshold` percent (raw USD vs EUR)."""
+    cm = next((s for s in today_rows if s.source == "cardmarket" and _price(s)), None)
+    if not cm:
+        return None
+    for s in today_rows:
+        if s.source != "tcgplayer" or _price(s) is None or (rule.variant and s.variant != rule.variant):
+            continue
+        pct = (_price(s) - _price(cm)) / _price(cm) * 100
+        if abs(pct) >= rule.threshold:
+            return pct, f"{rule.card_id} TCGplayer {s.variant} {_price(s):.2f} vs CardMarket {_price(cm):.2f} ({pct:+.1f}%)"
+    return None
+
+
+def _check_below_avg30(rule: AlertRule, today_rows: list, session, day: date) -> Optional[tuple[float, str]]:
+    """CardMarket market price at least `threshold` percent below its 30-day average."""
+    for s in today_rows:
+        p = _price(s)
+        if s.source != "cardmarket" or p is None or not s.avg_30:
+            continue
+        pct = (p - s.avg_30) / s.avg_30 * 100
+        if pct <= -rule.threshold and p < s.avg_30:
+            return pct, f"{rule.card_id} CardMarket {p:.2f} is {pct:.1f}% vs 30-day avg {s.avg_30:.2f}"
+    return None
+
+
+_CHECKS = {
+    "price_above": _check_price,
+    "price_below": _check_price,
+    "pct_move": _check_pct_move,
+    "spread": _check_spread,
+    "below_avg30": _check_below_avg30,
+}
+
+
+def evaluate_alerts(session, card_id: str, snapshot_date: Optional[date] = None) -> list[AlertEvent]:
+    """
+    Evaluate the rules for one card against its current prices as of `snapshot_date` (default today).
+    A rule fires once when its condition becomes true and re-arms when it turns false.
+    Adds AlertEvent rows to the session; the caller commits.
+    """
+    rules = session.query(AlertRule).filter(AlertRule.card_id == card_id).all()
+    if not rules:
+        return []
+    day = snapshot_date or date.today()
+    # Latest row per variant/source rather than rows dated `day`: with delta storage an
+    # unchanged price has no row for today
+    today_rows = list(latest_snapshots(session, card_id, day).values())
+    events = []
+    now = datetime.utcnow()
+    for rule in rules:
+        check = _CHECKS.get(rule.kind)
+        hit = check(rule, today_rows, session, day) if check else None
+        if hit and not rule.triggered:
+            value, message = hit
+            event = AlertEvent(
+                rule_id=rule.id, card_id=card_id, kind=rule.kind, value=value, message=message, fired_at=now
+            )
+            session.add(event)
+            events.append(event)
+        rule.triggered = bool(hit)
+    return events
@@ -1,22 +1,48 @@
 """FastAPI server that reads from the SQLite DB."""
+import asyncio
 import json
-import re
-from datetime import date, timedelta
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy.exc import SQLAlchemyError
+
+from config.settings import PERF_INSTRUMENTATION, PRICE_CUBE_MAX_AGE_SECONDS, PRICE_CUBE_PRELOAD
+from src.db import get_engine, get_session, init_db
+from src.alerts import ALERT_KINDS
+from src.broker import alert_broker, price_broker
+from src.images import IMAGE_SIZES, card_image_url, content_type, fetch_original, resized_path
+from src.models import AlertEvent, AlertRule, Card, Holding, PriceSnapshot
+from src.search import resolve_card_name, search_cards
+from src.storage import densify, is_delta, since_with_seed
+
+# Fetch machinery (requests), pandas/numpy analytics and the portfolio engine are imported inside
+# the endpoints that use them, so worker start-up only pays for FastAPI + SQLAlchemy.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_engine()
+    init_db()
+    if PRICE_CUBE_PRELOAD:
+        from src.cube import get_cube
+
+        session = get_session()
+        try:
+            get_cube(session)
+        finally:
+            session.close()
+    yield
 
-from src.db import get_session, init_db
-from src.models import Card, PriceSnapshot
-from src.fetcher import run_fetch
 
 app = FastAPI(
     title="Pokemon TCG Tracker API",
     description="Evidence-based buy/sell data for Pokemon TCG singles and sealed.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -27,23 +53,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if PERF_INSTRUMENTATION:
+    from src.perf import install as install_perf
 
-WATCHLIST_PATH = Path(__file__).resolve().parent.parent / "config" / "watchlist.json"
-WATCHLIST_MAX = 200
+    install_perf(app)
 
 
-def _image_url_for_card(card: Card) -> Optional[str]:
-    """Return image URL from DB, or derive TCGdex URL when null. TCGdex hosts free card art."""
-    if card.image_url:
-        return card.image_url
-    # Fallback: TCGdex URL pattern https://assets.tcgdex.net/en/{series}/{set_id}/{number}
-    # e.g. swsh4-25 -> swsh/swsh4/25, base1-4 -> base/base1/4
-    if card.set_id and card.number:
-        series = re.match(r"^([a-zA-Z]+)", card.set_id)
-        if series:
-            base = f"https://assets.tcgdex.net/en/{series.group(1)}/{card.set_id}/{card.number}"
-            return base
-    return None
+WATCHLIST_PATH = Path(__file__).resolve().parent.parent / "config" / "watchlist.json"
+WATCHLIST_MAX = 200
+ALERT_STREAM_POLL_SECONDS = 2.0
+ALERT_STREAM_KEEPALIVE_SECONDS = 15.0
+ALERT_STREAM_BATCH = 100
+PRICE_STREAM_KEEPALIVE_SECONDS = 15.0
+PRICE_BATCH_MAX = 1000
+PORTFOLIO_HISTORY_MAX_DAYS = 3650
+SQL_IN_CHUNK = 900  # Stay under SQLite's default bound-parameter limit on older builds
+# Not immutable: the URL is unversioned and the file can change (a corrupt original is fetched again,
+# resized files are rebuilt). After a day browsers revalidate with If-None-Match and usually get a 304.
+IMAGE_CACHE_CONTROL = "public, max-age=86400"
 
 
 def _load_watchlist_full() -> dict:
@@ -68,8 +95,18 @@ def root():
 @app.post("/api/refresh")
 def refresh_prices():
     """Fetch latest prices from TCGdex and save to DB. Call periodically (e.g. daily) to update data."""
+    from src.cube import loaded_cube
+    from src.fetcher import run_fetch
+
     try:
-        n = run_fetch(debug=False)
+        n = run_fetch(debug=False, prefetch_new_images=True)
+        cube = loaded_cube()
+        if cube:
+            session = get_session()
+            try:
+                cube.update(session)
+            finally:
+                session.close()
         return {"status": "ok", "cards_updated": n}
     except FileNotFoundError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -107,10 +144,27 @@ def add_to_watchlist(body: AddToWatchlist):
         ids.append(body.card_id)
         data["card_ids"] = ids
     else:
-        if body.card_name in names:
-            return {"status": "ok", "message": "Already in watchlist", "card_name": body.card_name}
+        key = body.card_name.strip().lower()
+        existing = next((x for x in names if x.strip().lower() == key), None)
+        if existing:
+            return {"status": "ok", "message": "Already in watchlist", "card_name": existing}
+        # Resolve against the local catalog first so refresh can fetch by ID instead of searching providers
+        init_db()
+        session = get_session()
+        try:
+            card = resolve_card_name(session, body.card_name)
+            resolved_id = card.id if card else None
+        finally:
+            session.close()
+        if resolved_id and resolved_id in ids:
+            return {"status": "ok", "message": "Already in watchlist", "card_id": resolved_id}
         if len(ids) + len(names) >= WATCHLIST_MAX:
             raise HTTPException(status_code=400, detail=f"Watchlist full ({WATCHLIST_MAX} max)")
+        if resolved_id:
+            ids.append(resolved_id)
+            data["card_ids"] = ids
+            _save_watchlist(data)
+            return {"status": "ok", "card_id": resolved_id, "card_name": body.card_name}
         names.append(body.card_name)
         data["card_names"] = names
     _save_watchlist(data)
@@ -132,14 +186,15 @@ def remove_from_watchlist(card_id: Optional[str] = None, card_name: Optional[str
             raise HTTPException(status_code=404, detail="Card ID not in watchlist")
         data["card_ids"] = [x for x in ids if x != card_id]
     else:
-        if card_name in names:
-            data["card_names"] = [x for x in names if x != card_name]
+        key = card_name.strip().lower()
+        if any(x.strip().lower() == key for x in names):
+            data["card_names"] = [x for x in names if x.strip().lower() != key]
         else:
-            # Fallback: card may have been added by ID; look up by name in DB
+            # Fallback: add-by-name stores the resolved card ID, so resolve the same way here
             init_db()
             session = get_session()
             try:
-                card = session.query(Card).filter(Card.name == card_name).first()
+                card = resolve_card_name(session, card_name)
                 if card and card.id in ids:
                     data["card_ids"] = [x for x in ids if x != card.id]
                 else:
@@ -150,6 +205,35 @@ def remove_from_watchlist(card_id: Optional[str] = None, card_name: Optional[str
     return {"status": "ok"}
 
 
+@app.get("/api/search")
+def search(q: str, limit: int = 10):
+    """Search the local catalog by name, set, rarity or number. Prefix and typo-tolerant."""
+    if not q.strip():
+        return {"query": q, "results": []}
+    limit = max(1, min(limit, 50))
+    init_db()
+    session = get_session()
+    try:
+        cards = search_cards(session, q, limit=limit)
+        return {
+            "query": q,
+            "results": [
+                {
+                    "id": c.id,
+                    "name": c.name,
+                    "set_id": c.set_id,
+                    "set_name": c.set_name,
+                    "number": c.number,
+                    "rarity": c.rarity,
+                    "image_url": card_image_url(c),
+                }
+                for c in cards
+            ],
+        }
+    finally:
+        session.close()
+
+
 @app.get("/api/cards")
 def get_cards():
     """List all cards in the catalog with latest prices."""
@@ -185,7 +269,8 @@ def get_cards():
                     "number": c.number,
                     "rarity": c.rarity,
                     "supertype": c.supertype,
-                    "image_url": _image_url_for_card(c),
+                    "image_url": card_image_url(c),
+                    "image_proxy_url": f"/api/images/{c.id}",
                     "latest_price": prices,
                 }
             )
@@ -230,13 +315,151 @@ def get_card(card_id: str):
             "number": card.number,
             "rarity": card.rarity,
             "supertype": card.supertype,
-            "image_url": _image_url_for_card(card),
+            "image_url": card_image_url(card),
+            "image_proxy_url": f"/api/images/{card.id}",
             "latest_price": prices,
         }
     finally:
         session.close()
 
 
+@app.get("/api/prices/stream")
+async def stream_prices(card_ids: Optional[str] = None, watchlist: bool = False):
+    """
+    Server-Sent Events stream of price updates as refreshes save them.
+    Optional filters: card_ids (comma-separated) or watchlist=true for the current watchlist IDs.
+    A `resync` event means this client fell behind and should reload /api/cards.
+    """
+    wanted = None
+    if card_ids:
+        wanted = {c.strip() for c in card_ids.split(",") if c.strip()}
+    if watchlist:
+        wanted = (wanted or set()) | set(_load_watchlist_full().get("card_ids", []))
+
+    sub = price_broker.subscribe(wanted)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    update = await asyncio.wait_for(sub.queue.get(), timeout=PRICE_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if sub.dropped:
+                    sub.dropped = 0
+                    yield "event: resync\ndata: {}\n\n"
+                yield f"event: price\ndata: {json.dumps(update)}\n\n"
+        finally:
+            price_broker.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def _filter_prices(q, card_ids: list[str], variant: Optional[str], source: Optional[str], days: Optional[int]):
+    """Apply the shared variant/source/days filters to a PriceSnapshot query already limited to card_ids."""
+    if variant:
+        q = q.filter(PriceSnapshot.variant == variant)
+    if source:
+        q = q.filter(PriceSnapshot.source == source)
+    if days:
+        cutoff = date.today() - timedelta(days=days)
+        # Delta storage also needs the last change before the cutoff to fill the window's first days
+        q = q.filter(since_with_seed(cutoff, card_ids) if is_delta() else PriceSnapshot.snapshot_date >= cutoff)
+    return q
+
+
+def _dense_rows(rows: list, end: Optional[date], days: Optional[int]) -> list:
+    """Delta storage: forward-fill change rows into a daily series, trimmed to the days window."""
+    rows = densify(rows, end)
+    if days:
+        cutoff = (date.today() - timedelta(days=days)).isoformat()
+        rows = [r for r in rows if r["date"] >= cutoff]
+    return rows
+
+
+def _price_row(s) -> dict:
+    return {
+        "date": s.snapshot_date.isoformat() if s.snapshot_date else None,
+        "variant": s.variant,
+        "source": s.source,
+        "market": s.market,
+        "low": s.low,
+        "mid": s.mid,
+        "high": s.high,
+        "avg_7": s.avg_7,
+        "avg_30": s.avg_30,
+    }
+
+
+def _downsample(rows: list, points: int) -> list:
+    """Keep `points` evenly spaced rows (always first and last) of an ordered series."""
+    n = len(rows)
+    if points <= 0 or n <= points:
+        return rows
+    if points == 1:
+        return [rows[-1]]
+    step = (n - 1) / (points - 1)
+    return [rows[round(i * step)] for i in range(points)]
+
+
+class PriceBatch(BaseModel):
+    card_ids: list[str]
+    variant: Optional[str] = None
+    source: Optional[str] = None
+    days: Optional[int] = None
+    points: Optional[int] = None  # Downsample each variant/source series to this many points
+
+
+@app.post("/api/prices/batch")
+def get_prices_batch(body: PriceBatch):
+    """Price history for many cards in one request (e.g. a grid of sparklines). Same filters as /api/prices/{card_id}."""
+    card_ids = list(dict.fromkeys(body.card_ids))
+    if len(card_ids) > PRICE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {PRICE_BATCH_MAX} card_ids per request")
+    init_db()
+    session = get_session()
+    try:
+        series: dict = {cid: [] for cid in card_ids}
+        ends: dict = {}
+        # Delta mode binds each chunk twice (rows + forward-fill seeds)
+        step = SQL_IN_CHUNK // 2 if is_delta() else SQL_IN_CHUNK
+        for i in range(0, len(card_ids), step):
+            chunk = card_ids[i:i + step]
+            if is_delta():
+                ends.update(session.query(Card.id, Card.updated_at).filter(Card.id.in_(chunk)).all())
+            q = session.query(
+                PriceSnapshot.card_id,
+                PriceSnapshot.snapshot_date,
+                PriceSnapshot.variant,
+                PriceSnapshot.source,
+                PriceSnapshot.market,
+                PriceSnapshot.low,
+                PriceSnapshot.mid,
+                PriceSnapshot.high,
+                PriceSnapshot.avg_7,
+                PriceSnapshot.avg_30,
+            ).filter(PriceSnapshot.card_id.in_(chunk))
+            q = _filter_prices(q, chunk, body.variant, body.source, body.days)
+            for s in q.order_by(PriceSnapshot.snapshot_date.asc()):
+                series[s.card_id].append(_price_row(s))
+
+        result = {}
+        for cid, rows in series.items():
+            if is_delta():
+                rows = _dense_rows(rows, ends.get(cid), body.days)
+            if body.points:
+                by_series: dict = {}
+                for r in rows:
+                    by_series.setdefault((r["variant"], r["source"]), []).append(r)
+                rows = [r for group in by_series.values() for r in _downsample(group, body.points)]
+                rows.sort(key=lambda r: r["date"] or "")
+            result[cid] = rows
+        return {"prices": result}
+    finally:
+        session.close()
+
+
 @app.get("/api/prices/{card_id}")
 def get_prices(
     card_id: str,
@@ -249,29 +472,388 @@ def get_prices(
     session = get_session()
     try:
         q = session.query(PriceSnapshot).filter(PriceSnapshot.card_id == card_id)
-        if variant:
-            q = q.filter(PriceSnapshot.variant == variant)
-        if source:
-            q = q.filter(PriceSnapshot.source == source)
-        if days:
-            cutoff = date.today() - timedelta(days=days)
-            q = q.filter(PriceSnapshot.snapshot_date >= cutoff)
+        q = _filter_prices(q, [card_id], variant, source, days)
         snapshots = q.order_by(PriceSnapshot.snapshot_date.asc()).all()
 
-        result = [
-            {
-                "date": s.snapshot_date.isoformat() if s.snapshot_date else None,
-                "variant": s.variant,
-                "source": s.source,
-                "market": s.market,
-                "low": s.low,
-                "mid": s.mid,
-                "high": s.high,
-                "avg_7": s.avg_7,
-                "avg_30": s.avg_30,
-            }
-            for s in snapshots
-        ]
+        result = [_price_row(s) for s in snapshots]
+        if is_delta():
+            end = session.query(Card.updated_at).filter(Card.id == card_id).scalar()
+            result = _dense_rows(result, end, days)
         return {"card_id": card_id, "prices": result}
     finally:
         session.close()
+
+
+class AddHolding(BaseModel):
+    card_id: str
+    variant: Optional[str] = None
+    quantity: int = 1
+    cost_basis: Optional[float] = None
+    acquired_date: Optional[date] = None
+
+
+@app.get("/api/portfolio")
+def get_portfolio(source: Optional[str] = None):
+    """Current value, cost and unrealized P&L of all holdings. Optional filter: source."""
+    from src.portfolio import portfolio_summary
+
+    init_db()
+    session = get_session()
+    try:
+        return portfolio_summary(session, source=source)
+    finally:
+        session.close()
+
+
+@app.get("/api/portfolio/history")
+def get_portfolio_history(days: int = 90, source: Optional[str] = None):
+    """Daily portfolio value series (missing price days are forward-filled)."""
+    from src.portfolio import portfolio_history
+
+    init_db()
+    session = get_session()
+    try:
+        return {"history": portfolio_history(session, days=min(max(0, days), PORTFOLIO_HISTORY_MAX_DAYS), source=source)}
+    finally:
+        session.close()
+
+
+@app.post("/api/portfolio/holdings")
+def add_holding(body: AddHolding):
+    """Add a holding (lot) to the portfolio. cost_basis is the price paid per unit."""
+    if body.quantity <= 0:
+        raise HTTPException(status_code=400, detail="quantity must be positive")
+    init_db()
+    session = get_session()
+    try:
+        holding = Holding(
+            card_id=body.card_id,
+            variant=body.variant,
+            quantity=body.quantity,
+            cost_basis=body.cost_basis,
+            acquired_date=body.acquired_date,
+        )
+        session.add(holding)
+        session.commit()
+        return {"status": "ok", "id": holding.id}
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+
+@app.delete("/api/portfolio/holdings/{holding_id}")
+def remove_holding(holding_id: int):
+    """Remove a holding by ID."""
+    init_db()
+    session = get_session()
+    try:
+        n = session.query(Holding).filter(Holding.id == holding_id).delete()
+        if not n:
+            raise HTTPException(status_code=404, detail="Holding not found")
+        session.commit()
+        return {"status": "ok"}
+    finally:
+        session.close()
+
+
+class AddAlertRule(BaseModel):
+    card_id: str
+    kind: str
+    threshold: float = 0
+    days: Optional[int] = None
+    variant: Optional[str] = None
+    source: Optional[str] = None
+
+
+def _event_to_dict(e: AlertEvent) -> dict:
+    return {
+        "id": e.id,
+        "rule_id": e.rule_id,
+        "card_id": e.card_id,
+        "kind": e.kind,
+        "value": e.value,
+        "message": e.message,
+        "fired_at": e.fired_at.isoformat() if e.fired_at else None,
+    }
+
+
+@app.get("/api/alerts/rules")
+def get_alert_rules():
+    """List alert rules."""
+    init_db()
+    session = get_session()
+    try:
+        return {
+            "rules": [
+                {
+                    "id": r.id,
+                    "card_id": r.card_id,
+                    "kind": r.kind,
+                    "threshold": r.threshold,
+                    "days": r.days,
+                    "variant": r.variant,
+                    "source": r.source,
+                    "triggered": r.triggered,
+                }
+                for r in session.query(AlertRule).order_by(AlertRule.id).all()
+            ]
+        }
+    finally:
+        session.close()
+
+
+@app.post("/api/alerts/rules")
+def add_alert_rule(body: AddAlertRule):
+    """Add an alert rule. Kinds: price_above, price_below, pct_move (threshold %, days), spread (%), below_avg30 (%)."""
+    if body.kind not in ALERT_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(ALERT_KINDS)}")
+    if body.kind == "pct_move":
+        if body.threshold == 0:
+            raise HTTPException(status_code=400, detail="threshold must be non-zero for pct_move (negative = fall)")
+    elif body.threshold <= 0:
+        raise HTTPException(status_code=400, detail=f"threshold must be greater than 0 for {body.kind}")
+    if body.days is not None and body.days < 1:
+        raise HTTPException(status_code=400, detail="days must be at least 1")
+    init_db()
+    session = get_session()
+    try:
+        rule = AlertRule(
+            card_id=body.card_id,
+            kind=body.kind,
+            threshold=body.threshold,
+            days=body.days,
+            variant=body.variant,
+            source=body.source,
+            triggered=False,
+            created_at=datetime.utcnow(),
+        )
+        session.add(rule)
+        session.commit()
+        return {"status": "ok", "id": rule.id}
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+
+@app.delete("/api/alerts/rules/{rule_id}")
+def remove_alert_rule(rule_id: int):
+    """Remove an alert rule by ID."""
+    init_db()
+    session = get_session()
+    try:
+        n = session.query(AlertRule).filter(AlertRule.id == rule_id).delete()
+        if not n:
+            raise HTTPException(status_code=404, detail="Alert rule not found")
+        session.commit()
+        return {"status": "ok"}
+    finally:
+        session.close()
+
+
+def _events_after(last_id: int, limit: int = 100) -> list[dict]:
+    session = get_session()
+    try:
+        events = (
+            session.query(AlertEvent)
+            .filter(AlertEvent.id > last_id)
+            .order_by(AlertEvent.id.asc())
+            .limit(limit)
+            .all()
+        )
+        return [_event_to_dict(e) for e in events]
+    finally:
+        session.close()
+
+
+def _latest_event_id() -> int:
+    session = get_session()
+    try:
+        latest = session.query(AlertEvent.id).order_by(AlertEvent.id.desc()).first()
+        return latest[0] if latest else 0
+    finally:
+        session.close()
+
+
+@app.get("/api/alerts/events")
+def get_alert_events(since_id: int = 0, limit: int = 100):
+    """Fired alerts with id > since_id, oldest first."""
+    init_db()
+    return {"events": _events_after(since_id, limit=max(1, min(limit, 1000)))}
+
+
+class _AlertTail:
+    """
+    The process's one poller of alert_events. Events may be written by another process
+    (scripts/run_fetch.py), so the table is tailed; new rows are published to alert_broker. Runs
+    only while an /api/alerts/stream client is connected, so open tabs share one query per poll.
+    """
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.ready: Optional[asyncio.Event] = None
+        self.last_id = 0
+
+    async def start(self) -> None:
+        """Start the poller if it isn't running; returns once last_id is known."""
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.ready = asyncio.Event()
+            self.task = loop.create_task(self._run())
+        await self.ready.wait()
+
+    async def _run(self) -> None:
+        try:
+            self.last_id = await asyncio.to_thread(_latest_event_id)
+        finally:
+            self.ready.set()
+        # No await between the check and returning, so a stream that subscribes after the
+        # last one left always finds the task done and starts a new one
+        while alert_broker.has_subscribers():
+            try:
+                batch = await asyncio.to_thread(_events_after, self.last_id, ALERT_STREAM_BATCH)
+            except SQLAlchemyError:
+                batch = []  # e.g. database locked by a writer; try again next poll
+            for e in batch:
+                self.last_id = e["id"]
+                alert_broker.publish(e["card_id"], e)
+            if len(batch) < ALERT_STREAM_BATCH:
+                await asyncio.sleep(ALERT_STREAM_POLL_SECONDS)
+
+
+_alert_tail = _AlertTail()
+
+
+@app.get("/api/alerts/stream")
+async def stream_alerts(since_id: Optional[int] = None, last_event_id: Optional[str] = Header(None)):
+    """Server-Sent Events stream of fired alerts. Resumes from Last-Event-ID or ?since_id= on reconnect."""
+    init_db()
+    sub = alert_broker.subscribe()
+    try:
+        await _alert_tail.start()
+    except BaseException:
+        alert_broker.unsubscribe(sub)
+        raise
+    if last_event_id and last_event_id.isdigit():
+        start = int(last_event_id)
+    elif since_id is not None:
+        start = since_id
+    else:
+        # New subscribers only get alerts fired from now on
+        start = _alert_tail.last_id
+
+    async def events():
+        last_id = start
+        # Events before the shared poller's position (a resume point, or events this client's
+        # queue dropped) are read from the table; after that the queue has everything newer
+        catch_up = last_id < _alert_tail.last_id
+        try:
+            while True:
+                while catch_up:
+                    batch = await asyncio.to_thread(_events_after, last_id, ALERT_STREAM_BATCH)
+                    for e in batch:
+                        last_id = e["id"]
+                        yield f"id: {e['id']}\nevent: alert\ndata: {json.dumps(e)}\n\n"
+                    catch_up = len(batch) == ALERT_STREAM_BATCH
+                try:
+                    e = await asyncio.wait_for(sub.queue.get(), timeout=ALERT_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if sub.dropped:
+                    sub.dropped = 0
+                    catch_up = True
+                    continue
+                if e["id"] > last_id:  # already sent during catch-up otherwise
+                    last_id = e["id"]
+                    yield f"id: {e['id']}\nevent: alert\ndata: {json.dumps(e)}\n\n"
+        finally:
+            alert_broker.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/api/images/{card_id}")
+def get_card_image(card_id: str, size: str = "small", if_none_match: Optional[str] = Header(None)):
+    """Card art served from the local cache. size: thumb, small (WebP) or original."""
+    if size != "original" and size not in IMAGE_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be original or one of {', '.join(IMAGE_SIZES)}")
+    init_db()
+    session = get_session()
+    try:
+        card = session.query(Card).filter(Card.id == card_id).first()
+        if not card:
+            raise HTTPException(status_code=404, detail="Card not found")
+        path = fetch_original(card) if size == "original" else resized_path(card, size)
+    finally:
+        session.close()
+    if not path:
+        raise HTTPException(status_code=404, detail="Image not available")
+
+    st = path.stat()
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    headers = {"ETag": etag, "Cache-Control": IMAGE_CACHE_CONTROL}
+    if if_none_match and etag in if_none_match:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=content_type(path), headers=headers)
+
+
+def _analytics_cube(session, field: str):
+    from src.cube import FIELDS, get_cube
+
+    if field not in FIELDS:
+        raise HTTPException(status_code=400, detail=f"field must be one of {', '.join(FIELDS)}")
+    return get_cube(session, max_age_seconds=PRICE_CUBE_MAX_AGE_SECONDS)
+
+
+@app.get("/api/analytics/movers")
+def get_movers(days: int = 7, field: str = "market", variant: Optional[str] = None,
+               source: Optional[str] = None, limit: int = 20):
+    """Biggest % gainers and losers over the last N days, from the in-memory price cube."""
+    init_db()
+    session = get_session()
+    try:
+        cube = _analytics_cube(session, field)
+        return cube.movers(days=max(1, days), field=field, variant=variant, source=source, limit=max(1, min(limit, 200)))
+    finally:
+        session.close()
+
+
+@app.get("/api/analytics/sets")
+def get_set_trends(days: int = 30, field: str = "market", variant: Optional[str] = None, source: Optional[str] = None):
+    """Average % change and total current value per set over the last N days."""
+    init_db()
+    session = get_session()
+    try:
+        cube = _analytics_cube(session, field)
+        return {"sets": cube.set_trends(days=max(1, days), field=field, variant=variant, source=source)}
+    finally:
+        session.close()
+
+
+@app.get("/api/analytics/series/{card_id}")
+def get_dense_series(card_id: str, field: str = "market", days: Optional[int] = None):
+    """Daily forward-filled series per variant/source for one card."""
+    init_db()
+    session = get_session()
+    try:
+        cube = _analytics_cube(session, field)
+        return {"card_id": card_id, "series": cube.series(card_id, field=field, days=days)}
+    finally:
+        session.close()
+
+
+@app.get("/api/analytics/cube")
+def get_cube_stats():
+    """Price cube shape and memory footprint (loads it if needed)."""
+    from src.cube import get_cube
+
+    init_db()
+    session = get_session()
+    try:
+        return get_cube(session).stats()
+    finally:
+        session.close()
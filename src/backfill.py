@@ -0,0 +1,305 @@
+"""Bulk import of historical price dumps (CSV, NDJSON, Parquet) into price_snapshots.
+
+The input is streamed in blocks: text files are cut into newline-aligned byte ranges and
+Parquet files by row group. Blocks are parsed in a process pool and written in order with
+an upsert on uq_snapshot, one transaction per block. After each block commits, a checkpoint
+file next to the input records how far the import got; rerunning resumes from there.
+Because writes are upserts, replaying a block after a crash is harmless.
+"""
+import io
+import json
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.db import get_engine, init_db
+from src.storage import VARIANTS
+
+COLUMNS = ("card_id", "snapshot_date", "variant", "source",
+           "low", "mid", "high", "market", "direct_low", "avg_1", "avg_7", "avg_30")
+PRICE_COLUMNS = COLUMNS[4:]
+
+# Common export headers -> our column names
+COLUMN_ALIASES = {
+    "id": "card_id", "cardid": "card_id", "card": "card_id",
+    "date": "snapshot_date", "day": "snapshot_date", "snapshotdate": "snapshot_date",
+    "printing": "variant", "subtype": "variant", "subtypename": "variant", "finish": "variant",
+    "lowprice": "low", "midprice": "mid", "highprice": "high",
+    "marketprice": "market", "trendprice": "market", "trend": "market", "avg": "market",
+    "directlowprice": "direct_low", "directlow": "direct_low",
+    "avg1": "avg_1", "avg7": "avg_7", "avg30": "avg_30",
+}
+
+# Export spellings ("Reverse Holofoil", "holo", "1st_edition_normal") -> the variant keys live
+# ingestion stores, matched on lower-case letters and digits only
+VARIANT_KEYS = {k.lower(): k for k in VARIANTS}
+VARIANT_KEYS.update({
+    "holo": "holofoil",
+    "reverseholo": "reverseHolofoil",
+    "reverse": "reverseHolofoil",
+    "1steditionholo": "1stEditionHolofoil",
+    "1stedition": "1stEditionNormal",
+    "unlimitedholo": "unlimitedHolofoil",
+})
+
+BLOCK_BYTES = 8 * 1024 * 1024
+IMPORT_CACHE_KIB = 256 * 1024  # SQLite page cache for the import connection; the default 2 MB thrashes on big indexes
+
+_UPSERT_SQL = (
+    f"INSERT INTO price_snapshots ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)}) "
+    "ON CONFLICT(card_id, snapshot_date, variant, source) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in PRICE_COLUMNS)
+)
+_INSERT_IGNORE_SQL = (
+    f"INSERT INTO price_snapshots ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)}) "
+    "ON CONFLICT(card_id, snapshot_date, variant, source) DO NOTHING"
+)
+
+
+def detect_format(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix in (".csv", ".tsv"):
+        return "csv"
+    if suffix in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    if suffix in (".parquet", ".pq"):
+        return "parquet"
+    raise ValueError(f"Can't tell format of {path.name}; pass --format csv|ndjson|parquet")
+
+
+def _local_day(value: str) -> Optional[str]:
+    try:
+        ts = pd.Timestamp(value)
+    except (ValueError, OverflowError):
+        return None
+    return None if ts is pd.NaT else ts.strftime("%Y-%m-%d")
+
+
+def _iso_dates(col: pd.Series) -> np.ndarray:
+    """
+    Any date/datetime column -> 'YYYY-MM-DD' strings (None where unparseable). Timestamps keep the
+    day in their own timezone: '2024-01-03T23:30:00-05:00' is 2024-01-03, not the UTC day.
+    """
+    if isinstance(col.dtype, pd.DatetimeTZDtype):
+        col = col.dt.tz_localize(None)  # wall-clock time in the column's zone
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return _day_strings(col.to_numpy())
+    # Work on distinct values (a dump repeats each day many times). ISO dates and timestamps are
+    # read off the string as is; anything else is parsed one value at a time, so formats may mix.
+    codes, uniq = pd.factorize(col.astype("string"))
+    uniq = pd.Series(uniq, dtype="string").str.strip()
+    days = _day_strings(pd.to_datetime(uniq.str[:10], format="%Y-%m-%d", errors="coerce").to_numpy())
+    rest = days == None  # noqa: E711 (elementwise on object arrays)
+    days[rest] = [_local_day(v) for v in uniq[rest]]
+    return np.append(days, None)[codes]  # code -1 (missing) picks the trailing None
+
+
+def _day_strings(values: np.ndarray) -> np.ndarray:
+    days = values.astype("datetime64[D]")
+    # numpy's datetime64 -> str cast is much faster than Series.dt.strftime
+    return np.where(np.isnat(days), None, days.astype(str).astype(object))
+
+
+def _text(col: pd.Series) -> np.ndarray:
+    values = col.to_numpy(dtype=object)
+    return np.where(pd.isna(values), None, values.astype(str).astype(object))
+
+
+def _variant_key(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    return VARIANT_KEYS.get(re.sub(r"[^a-z0-9]", "", value.lower()), value.strip())
+
+
+def _normalize_frame(df: pd.DataFrame, defaults: dict, keep_last: bool) -> tuple[list[tuple], int]:
+    """
+    Map export columns onto price_snapshots columns. Returns (rows ready for executemany, rows
+    skipped for a missing card/date/variant/source). Rows repeating a key keep the last one in
+    input order (first with keep_last=False).
+    """
+    df = df.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).lower().replace("_", ""), str(c).lower()))
+    if "card_id" not in df.columns or "snapshot_date" not in df.columns:
+        raise ValueError(f"Input needs card_id and date columns; got {list(df.columns)}")
+    if "source" not in df.columns and not defaults.get("source"):
+        raise ValueError("Input has no source column; pass --source tcgplayer or --source cardmarket")
+    for col in ("variant", "source"):
+        if col not in df.columns:
+            df[col] = defaults.get(col)
+        elif defaults.get(col):
+            df[col] = df[col].fillna(defaults[col])
+    codes, uniq = pd.factorize(_text(df["variant"]))  # map each distinct spelling once
+    mapped = np.array([_variant_key(v) for v in uniq] + [None], dtype=object)
+    columns = [
+        _text(df["card_id"]),
+        _iso_dates(df["snapshot_date"]),
+        mapped[codes],  # code -1 (missing) picks the trailing None
+        np.array([s.strip().lower() if s else None for s in _text(df["source"])], dtype=object),
+    ]
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+            columns.append(np.where(np.isnan(values), None, values.astype(object)))
+        else:
+            columns.append(np.full(len(df), None, dtype=object))
+    keep = np.ones(len(df), dtype=bool)
+    for key in columns[:4]:
+        keep &= key != None  # noqa: E711 (elementwise on object arrays)
+    # Key order keeps the writer's B-tree inserts local (~1.5x faster than input order). The sort
+    # is stable and compares only the key (values may be None), so repeats stay in input order.
+    rows = sorted(zip(*(c[keep].tolist() for c in columns)), key=itemgetter(0, 1, 2, 3))
+    if keep_last:
+        rows = [r for r, nxt in zip(rows, rows[1:] + [None]) if nxt is None or nxt[:4] != r[:4]]
+    else:
+        rows = [r for r, prev in zip(rows, [None] + rows[:-1]) if prev is None or prev[:4] != r[:4]]
+    return rows, int((~keep).sum())
+
+
+def _parse_text_block(fmt: str, header: bytes, data: bytes, defaults: dict, keep_last: bool) -> tuple[list[tuple], int]:
+    if fmt == "csv":
+        df = pd.read_csv(io.BytesIO(header + data), dtype=str, keep_default_na=True)
+    else:
+        df = pd.read_json(io.BytesIO(data), lines=True, dtype=False, convert_dates=False)  # dates: _iso_dates
+    return _normalize_frame(df, defaults, keep_last)
+
+
+def _pyarrow_parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet input needs pyarrow (pip install pyarrow)") from None
+    return pq
+
+
+def _parse_parquet_group(path: str, group: int, defaults: dict, keep_last: bool) -> tuple[list[tuple], int]:
+    table = _pyarrow_parquet().ParquetFile(path).read_row_group(group)
+    return _normalize_frame(table.to_pandas(), defaults, keep_last)
+
+
+def _text_blocks(path: Path, fmt: str, offset: int, block_bytes: int) -> Iterator[tuple[int, bytes, bytes]]:
+    """Yield (end_offset, header, block) with blocks cut on newline boundaries."""
+    with open(path, "rb") as f:
+        header = f.readline() if fmt == "csv" else b""
+        if offset < f.tell():
+            offset = f.tell()
+        f.seek(offset)
+        while True:
+            block = f.read(block_bytes)
+            if not block:
+                return
+            block += f.readline()  # finish the last partial line
+            yield f.tell(), header, block
+
+
+# -- checkpoints ----------------------------------------------------------------------------------
+
+def _checkpoint_path(path: Path) -> Path:
+    return path.with_name(path.name + ".checkpoint.json")
+
+
+def _load_checkpoint(path: Path) -> dict:
+    cp = _checkpoint_path(path)
+    if not cp.exists():
+        return {}
+    data = json.loads(cp.read_text())
+    st = path.stat()
+    if data.get("size") != st.st_size or data.get("mtime") != int(st.st_mtime):
+        return {}  # Input changed since the checkpoint; start over
+    return data
+
+
+def _save_checkpoint(path: Path, position: int, rows: int, skipped: int) -> None:
+    st = path.stat()
+    cp = _checkpoint_path(path)
+    tmp = cp.with_suffix(".tmp")
+    tmp.write_text(json.dumps({
+        "position": position, "rows": rows, "skipped": skipped, "size": st.st_size, "mtime": int(st.st_mtime),
+    }))
+    os.replace(tmp, cp)
+
+
+# -- main entry -----------------------------------------------------------------------------------
+
+def backfill(
+    path: Path,
+    fmt: Optional[str] = None,
+    source: Optional[str] = None,
+    variant: Optional[str] = None,
+    workers: Optional[int] = None,
+    block_bytes: int = BLOCK_BYTES,
+    overwrite: bool = True,
+    resume: bool = True,
+    progress: Optional[Callable[[str], None]] = print,
+) -> int:
+    """
+    Import a price archive. `source`/`variant` fill in files that lack those columns; a file
+    without a source column needs `source`. Variant spellings are mapped to the internal keys.
+    overwrite=False keeps existing rows for the same card/date/variant/source (and the first of
+    any repeats in the file); otherwise the last one in the file wins.
+    Returns rows written in this run.
+    """
+    path = Path(path)
+    fmt = fmt or detect_format(path)
+    defaults = {"source": source, "variant": _variant_key(variant or "normal")}
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+
+    checkpoint = _load_checkpoint(path) if resume else {}
+    position = checkpoint.get("position", 0)
+    total = checkpoint.get("rows", 0)
+    skipped = checkpoint.get("skipped", 0)
+    if position and progress:
+        progress(f"Resuming {path.name} at {'row group' if fmt == 'parquet' else 'byte'} {position} ({total} rows done)")
+
+    init_db()
+    conn = get_engine().raw_connection()
+    sql = _UPSERT_SQL if overwrite else _INSERT_IGNORE_SQL
+    written = 0
+    try:
+        cur = conn.cursor()
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute(f"PRAGMA cache_size=-{IMPORT_CACHE_KIB}")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            if fmt == "parquet":
+                n_groups = _pyarrow_parquet().ParquetFile(path).num_row_groups
+                jobs = ((g + 1, _parse_parquet_group, (str(path), g, defaults, overwrite)) for g in range(position, n_groups))
+            else:
+                jobs = (
+                    (end, _parse_text_block, (fmt, header, block, defaults, overwrite))
+                    for end, header, block in _text_blocks(path, fmt, position, block_bytes)
+                )
+
+            # Bounded window of blocks in flight so memory stays flat on huge inputs. Blocks are
+            # written in input order, so the checkpoint only ever moves past fully committed data.
+            in_flight: deque = deque()
+
+            def write_oldest() -> None:
+                nonlocal written, skipped
+                end, future = in_flight.popleft()
+                rows, dropped = future.result()
+                conn.cursor().executemany(sql, rows)
+                conn.commit()
+                written += len(rows)
+                skipped += dropped
+                _save_checkpoint(path, end, total + written, skipped)
+                if progress:
+                    progress(f"  {total + written:,} rows ({skipped:,} skipped)")
+
+            for end, fn, args in jobs:
+                in_flight.append((end, pool.submit(fn, *args)))
+                if len(in_flight) > workers:
+                    write_oldest()
+            while in_flight:
+                write_oldest()
+    finally:
+        conn.close()
+    if progress:
+        progress(f"Imported {written:,} rows from {path.name} ({total + written:,} total)")
+        if skipped:
+            progress(f"Skipped {skipped:,} rows with a missing card, date, variant or source, or an unparseable date")
+    return written
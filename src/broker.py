@@ -0,0 +1,76 @@
+"""In-process pub/sub for live updates. save_card_prices publishes prices and the API's alert poller
+publishes fired alerts; SSE clients subscribe."""
+import asyncio
+import threading
+from typing import Optional
+
+SUBSCRIBER_QUEUE_MAX = 256
+
+
+class Subscription:
+    """One connected client: a bounded queue plus the card IDs it cares about (None = all)."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, card_ids: Optional[set], maxsize: int):
+        self.loop = loop
+        self.card_ids = card_ids
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def _offer(self, event: dict) -> None:
+        # Backpressure: a slow client loses its oldest updates instead of growing memory.
+        # The stream tells it to resync once it catches up.
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class PriceBroker:
+    """Fan-out of per-card price events. Subscribers are indexed by card_id so publish cost
+    scales with interested clients, and idle clients cost nothing but an awaiting coroutine."""
+
+    def __init__(self, maxsize: int = SUBSCRIBER_QUEUE_MAX):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._by_card: dict = {}
+        self._all: set = set()
+
+    def subscribe(self, card_ids: Optional[set] = None) -> Subscription:
+        sub = Subscription(asyncio.get_running_loop(), card_ids, self.maxsize)
+        with self._lock:
+            if card_ids is None:
+                self._all.add(sub)
+            else:
+                for cid in card_ids:
+                    self._by_card.setdefault(cid, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._all.discard(sub)
+            for cid in sub.card_ids or ():
+                subs = self._by_card.get(cid)
+                if subs:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._by_card[cid]
+
+    def has_subscribers(self, card_id: Optional[str] = None) -> bool:
+        """Anyone listening to card_id (to any card when card_id is None)."""
+        if card_id is None:
+            return bool(self._all or self._by_card)
+        return bool(self._all) or card_id in self._by_card
+
+    def publish(self, card_id: str, event: dict) -> None:
+        """Deliver to every subscriber of card_id. Safe to call from any thread."""
+        with self._lock:
+            targets = list(self._all) + list(self._by_card.get(card_id, ()))
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, event)
+            except RuntimeError:
+                pass  # client's loop is closed; it will be unsubscribed by its stream
+
+
+price_broker = PriceBroker()
+alert_broker = PriceBroker()
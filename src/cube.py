@@ -0,0 +1,355 @@
+"""In-memory columnar price cube for analytics: NumPy arrays of (series x day) per price field.
+
+A series is one (card, variant, source). Card IDs, variants, sources and set IDs are stored as
+compact integer codes; strings only live in the small vocabularies. Loaded from SQLite in bulk,
+then topped up incrementally after each refresh: rows inserted since the last read (by id, which
+catches backfilled history too) plus rows on/after the cube's last day (re-fetched today).
+Rows whose values are updated in place for an older day are only seen on a reload.
+"""
+import threading
+import time
+from datetime import date
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+FIELDS = ("market", "low", "mid", "high")
+LOAD_CHUNK_ROWS = 200_000
+
+_SNAPSHOT_SQL = (
+    "SELECT card_id, variant, source, snapshot_date, market, low, mid, high FROM price_snapshots"
+)
+
+
+class _Vocab:
+    """String <-> small int code."""
+
+    def __init__(self):
+        self.codes: dict = {}
+        self.values: list = []
+
+    def code(self, value) -> int:
+        c = self.codes.get(value)
+        if c is None:
+            c = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+    def encode(self, values) -> np.ndarray:
+        """Vectorized encode: hash-factorize, then only the distinct values go through the dict."""
+        inverse, uniq = pd.factorize(np.asarray(values, dtype=object))
+        return np.array([self.code(v) for v in uniq], dtype=np.int32)[inverse]
+
+    def nbytes(self) -> int:
+        return sum(len(str(v)) + 50 for v in self.values)
+
+
+def _ffill(a: np.ndarray) -> np.ndarray:
+    """Forward-fill NaNs along the day axis."""
+    if a.size == 0:
+        return a
+    idx = np.where(np.isnan(a), 0, np.arange(a.shape[1]))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    return a[np.arange(a.shape[0])[:, None], idx]
+
+
+class PriceCube:
+    def __init__(self):
+        self.cards = _Vocab()
+        self.variants = _Vocab()
+        self.sources = _Vocab()
+        self.sets = _Vocab()
+        self.card_set = np.empty(0, dtype=np.int32)  # card code -> set code
+        self.series_rows: dict = {}  # packed (card, variant, source) key -> row
+        self.series_card = np.empty(0, dtype=np.int32)
+        self.series_variant = np.empty(0, dtype=np.int32)
+        self.series_source = np.empty(0, dtype=np.int32)
+        self.start: Optional[np.datetime64] = None  # date of column 0
+        self.values = {f: np.empty((0, 0), dtype=np.float32) for f in FIELDS}
+        self.loaded_at = 0.0
+        self.max_id = 0  # Highest price_snapshots.id read so far
+        self._lock = threading.RLock()
+
+    # -- loading -----------------------------------------------------------------------------
+
+    @property
+    def n_days(self) -> int:
+        return self.values[FIELDS[0]].shape[1]
+
+    @property
+    def end(self) -> Optional[date]:
+        if self.start is None or not self.n_days:
+            return None
+        return (self.start + np.timedelta64(self.n_days - 1, "D")).astype(date)
+
+    def load(self, session) -> "PriceCube":
+        """Cold start: stream all snapshots from SQLite in chunks."""
+        with self._lock:
+            self._load_sets(session)
+            # Taken before reading: rows inserted meanwhile are read again by the next update
+            max_id = self._current_max_id(session)
+            # Raw DB-API cursor: skips SQLAlchemy per-row processing on millions of rows
+            cursor = session.connection().connection.cursor()
+            try:
+                cursor.execute(_SNAPSHOT_SQL)
+                while True:
+                    rows = cursor.fetchmany(LOAD_CHUNK_ROWS)
+                    if not rows:
+                        break
+                    self._ingest(rows)
+            finally:
+                cursor.close()
+            self.max_id = max_id
+            self.loaded_at = time.time()
+        return self
+
+    def update(self, session) -> int:
+        """
+        Incremental top-up: rows inserted since the last read (any date, e.g. a backfill) plus rows
+        from the newest day in the cube onwards. Returns rows read.
+        """
+        with self._lock:
+            if self.end is None:
+                self.load(session)
+                return 0
+            self._load_sets(session)
+            max_id = self._current_max_id(session)
+            # The date term matters because ids aren't AUTOINCREMENT: a refresh that deletes and
+            # re-inserts today's newest row can get the same id back
+            rows = session.connection().execute(
+                text(_SNAPSHOT_SQL + " WHERE id > :max_id OR snapshot_date >= :since"),
+                {"max_id": self.max_id, "since": self.end.isoformat()},
+            ).fetchall()
+            self._ingest(rows)
+            self.max_id = max_id
+            self.loaded_at = time.time()
+            return len(rows)
+
+    @staticmethod
+    def _current_max_id(session) -> int:
+        return session.connection().execute(text("SELECT COALESCE(MAX(id), 0) FROM price_snapshots")).scalar()
+
+    def _load_sets(self, session) -> None:
+        rows = session.connection().execute(text("SELECT id, set_id FROM cards")).fetchall()
+        for card_id, set_id in rows:
+            c = self.cards.code(card_id)
+            self._grow_cards()
+            self.card_set[c] = self.sets.code(set_id or "")
+
+    def _grow_cards(self) -> None:
+        n = len(self.cards.values)
+        if len(self.card_set) < n:
+            self.card_set = np.concatenate([self.card_set, np.full(n - len(self.card_set), -1, dtype=np.int32)])
+
+    def _ingest(self, rows: list) -> None:
+        if not rows:
+            return
+        cols = list(zip(*rows))
+        card = self.cards.encode(cols[0])
+        variant = self.variants.encode(cols[1])
+        source = self.sources.encode(cols[2])
+        days = np.array(cols[3], dtype="datetime64[D]")
+        self._grow_cards()
+
+        # Series rows: look up only the distinct keys
+        keys = (card.astype(np.int64) << 32) | (variant.astype(np.int64) << 16) | source.astype(np.int64)
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        new = [k for k in uniq.tolist() if k not in self.series_rows]
+        if new:
+            base = len(self.series_card)
+            for i, k in enumerate(new):
+                self.series_rows[k] = base + i
+            new_arr = np.array(new, dtype=np.int64)
+            self.series_card = np.concatenate([self.series_card, (new_arr >> 32).astype(np.int32)])
+            self.series_variant = np.concatenate([self.series_variant, ((new_arr >> 16) & 0xFFFF).astype(np.int32)])
+            self.series_source = np.concatenate([self.series_source, (new_arr & 0xFFFF).astype(np.int32)])
+        row = np.array([self.series_rows[k] for k in uniq.tolist()], dtype=np.int64)[inverse]
+
+        self._grow(len(self.series_card), days.min(), days.max())
+        col = (days - self.start).astype(np.int64)
+        for i, f in enumerate(FIELDS):
+            vals = np.array(cols[4 + i], dtype=np.float64)  # None -> nan
+            self.values[f][row, col] = vals
+
+    def _grow(self, n_series: int, first: np.datetime64, last: np.datetime64) -> None:
+        """Resize the arrays to cover n_series rows and [first, last] days."""
+        if self.start is None:
+            self.start = first
+        pad_before = max(0, int((self.start - first).astype(int)))
+        cur_end = self.start + np.timedelta64(max(self.n_days - 1, 0), "D")
+        pad_after = max(0, int((last - cur_end).astype(int))) if self.n_days else int((last - self.start).astype(int)) + 1
+        pad_rows = max(0, n_series - self.values[FIELDS[0]].shape[0])
+        if pad_before or pad_after or pad_rows:
+            for f in FIELDS:
+                self.values[f] = np.pad(
+                    self.values[f], ((0, pad_rows), (pad_before, pad_after)), constant_values=np.nan
+                )
+            self.start = self.start - np.timedelta64(pad_before, "D")
+
+    # -- queries -----------------------------------------------------------------------------
+
+    def _mask(self, variant: Optional[str], source: Optional[str]) -> np.ndarray:
+        mask = np.ones(len(self.series_card), dtype=bool)
+        if variant:
+            mask &= self.series_variant == self.variants.codes.get(variant, -1)
+        if source:
+            mask &= self.series_source == self.sources.codes.get(source, -1)
+        return mask
+
+    def _window_change(self, days: int, field: str, variant: Optional[str], source: Optional[str]):
+        """(series rows, first value, last value) over the last `days` days, forward-filled."""
+        a = self.values[field]
+        rows = np.nonzero(self._mask(variant, source))[0]
+        if not len(rows) or not self.n_days:
+            empty = np.empty(0)
+            return rows, empty, empty
+        filled = _ffill(a[rows])
+        last = filled[:, -1]
+        first = filled[:, max(0, self.n_days - 1 - days)]
+        return rows, first, last
+
+    def movers(self, days: int = 7, field: str = "market", variant: Optional[str] = None,
+               source: Optional[str] = None, limit: int = 20) -> dict:
+        """Biggest % gainers and losers over the last `days` days."""
+        with self._lock:
+            rows, first, last = self._window_change(days, field, variant, source)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                pct = (last - first) / first * 100
+            ok = np.isfinite(pct) & (first > 0)
+            rows, first, last, pct = rows[ok], first[ok], last[ok], pct[ok]
+            order = np.argsort(pct)
+
+            def pick(idx):
+                return [
+                    {
+                        "card_id": self.cards.values[self.series_card[rows[i]]],
+                        "variant": self.variants.values[self.series_variant[rows[i]]],
+                        "source": self.sources.values[self.series_source[rows[i]]],
+                        "from": round(float(first[i]), 2),
+                        "to": round(float(last[i]), 2),
+                        "pct_change": round(float(pct[i]), 2),
+                    }
+                    for i in idx
+                ]
+
+            return {"gainers": pick(order[::-1][:limit]), "losers": pick(order[:limit])}
+
+    def set_trends(self, days: int = 30, field: str = "market", variant: Optional[str] = None,
+                   source: Optional[str] = None) -> list[dict]:
+        """Mean % change and current total value per set over the last `days` days."""
+        with self._lock:
+            rows, first, last = self._window_change(days, field, variant, source)
+            if not len(rows):
+                return []
+            sets = self.card_set[self.series_card[rows]]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                pct = (last - first) / first * 100
+            ok = np.isfinite(pct) & (first > 0) & (sets >= 0)
+            n_sets = len(self.sets.values)
+            count = np.bincount(sets[ok], minlength=n_sets)
+            pct_sum = np.bincount(sets[ok], weights=pct[ok], minlength=n_sets)
+            has_last = np.isfinite(last) & (sets >= 0)
+            value = np.bincount(sets[has_last], weights=last[has_last], minlength=n_sets)
+            out = [
+                {
+                    "set_id": self.sets.values[s],
+                    "series": int(count[s]),
+                    "avg_pct_change": round(float(pct_sum[s] / count[s]), 2),
+                    "total_value": round(float(value[s]), 2),
+                }
+                for s in np.nonzero(count)[0]
+            ]
+            return sorted(out, key=lambda r: -r["avg_pct_change"])
+
+    def series(self, card_id: str, field: str = "market", days: Optional[int] = None) -> list[dict]:
+        """Dense daily (forward-filled) series for each variant/source of one card."""
+        with self._lock:
+            c = self.cards.codes.get(card_id)
+            if c is None or not self.n_days:
+                return []
+            rows = np.nonzero(self.series_card == c)[0]
+            start_col = max(0, self.n_days - 1 - days) if days else 0
+            filled = _ffill(self.values[field][rows])[:, start_col:]
+            first_day = self.start + np.timedelta64(start_col, "D")
+            return [
+                {
+                    "variant": self.variants.values[self.series_variant[r]],
+                    "source": self.sources.values[self.series_source[r]],
+                    "start": first_day.astype(date).isoformat(),
+                    "values": [None if np.isnan(v) else round(float(v), 2) for v in vals],
+                }
+                for r, vals in zip(rows, filled)
+            ]
+
+    def series_for_cards(self, card_ids) -> pd.DataFrame:
+        """card_id, variant, source and cube row of every series of these cards."""
+        with self._lock:
+            codes = [self.cards.codes[c] for c in set(card_ids) if c in self.cards.codes]
+            rows = np.nonzero(np.isin(self.series_card, codes))[0]
+            return pd.DataFrame({
+                "card_id": [self.cards.values[c] for c in self.series_card[rows]],
+                "variant": [self.variants.values[v] for v in self.series_variant[rows]],
+                "source": [self.sources.values[s] for s in self.series_source[rows]],
+                "row": rows,
+            }, dtype=object).astype({"row": np.int64})  # object keys even when empty, for merges
+
+    def daily_values(self, rows: np.ndarray, start: date, end: date, fields: tuple = ("market",)) -> np.ndarray:
+        """
+        (len(rows), days) float64 values for each day start..end, forward-filled (also past the
+        cube's last day). Each day takes the first of `fields` that is present. NaN before a
+        series' first row.
+        """
+        with self._lock:
+            n = (end - start).days + 1
+            out = np.full((len(rows), n), np.nan)
+            if not len(rows) or not self.n_days:
+                return out
+            a = self.values[fields[0]][rows].astype(np.float64)
+            for f in fields[1:]:
+                a = np.where(np.isnan(a), self.values[f][rows], a)
+            filled = _ffill(a)
+            cols = (np.datetime64(start, "D") + np.arange(n) - self.start).astype(np.int64)
+            valid = cols >= 0
+            out[:, valid] = filled[:, np.minimum(cols[valid], self.n_days - 1)]
+            return out
+
+    def stats(self) -> dict:
+        """Shape and memory footprint."""
+        with self._lock:
+            arrays = list(self.values.values()) + [
+                self.card_set, self.series_card, self.series_variant, self.series_source,
+            ]
+            array_bytes = sum(a.nbytes for a in arrays)
+            vocab_bytes = sum(v.nbytes() for v in (self.cards, self.variants, self.sources, self.sets))
+            return {
+                "cards": len(self.cards.values),
+                "series": len(self.series_card),
+                "days": self.n_days,
+                "start": self.start.astype(date).isoformat() if self.start is not None else None,
+                "end": self.end.isoformat() if self.end else None,
+                "fields": list(FIELDS),
+                "memory_bytes": int(array_bytes + vocab_bytes + len(self.series_rows) * 100),
+                "loaded_at": self.loaded_at,
+            }
+
+
+_cube: Optional[PriceCube] = None
+_cube_lock = threading.Lock()
+
+
+def loaded_cube() -> Optional[PriceCube]:
+    """The shared cube if it has been loaded, else None (doesn't trigger a load)."""
+    return _cube
+
+
+def get_cube(session, max_age_seconds: Optional[float] = None) -> PriceCube:
+    """Shared cube, loaded on first use and topped up when older than max_age_seconds."""
+    global _cube
+    with _cube_lock:
+        if _cube is None:
+            _cube = PriceCube().load(session)
+        elif max_age_seconds is not None and time.time() - _cube.loaded_at > max_age_seconds:
+            _cube.update(session)
+        return _cube
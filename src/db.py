@@ -1,21 +1,33 @@
 """Database schema and session management."""
-from pathlib import Path
-
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from config.settings import DB_PATH
 
-# Ensure data dir exists
-DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-engine = create_engine(f"sqlite:///{DB_PATH}", echo=False)
 Base = declarative_base()
-Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+Session = sessionmaker(autocommit=False, autoflush=False)
+
+# Created on first use (API lifespan hook, script, or first session) rather than at import
+_engine = None
+_initialized = False
+
+
+def get_engine():
+    """Return the shared engine, creating it (and the data dir) on first call."""
+    global _engine
+    if _engine is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _engine = create_engine(f"sqlite:///{DB_PATH}", echo=False)
+        Session.configure(bind=_engine)
+    return _engine
 
 
 def init_db():
-    """Create tables if they don't exist. Import models before calling."""
+    """Create tables if they don't exist. Import models before calling. No-op after the first call."""
+    global _initialized
+    if _initialized:
+        return
+    engine = get_engine()
     import src.models  # noqa: F401 - register tables with Base
     Base.metadata.create_all(engine)
     # Migration: add image_url to cards if missing
@@ -25,11 +37,27 @@ def init_db():
             conn.commit()
     except Exception:
         pass  # column already exists
+    # Migration: series-ordered snapshot index (added after price_snapshots existed)
+    with engine.connect() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_snapshot_series ON price_snapshots (card_id, variant, source, snapshot_date)"
+        ))
+        conn.commit()
+    # Full-text search index over the card catalog (see src/search.py)
+    try:
+        from src.search import create_search_index
+        with engine.connect() as conn:
+            create_search_index(conn)
+            conn.commit()
+    except Exception:
+        pass  # SQLite built without FTS5; search falls back to fuzzy matching
+    _initialized = True
 
 
 def get_session():
     """Return a new session. Caller should close when done."""
+    get_engine()
     return Session()
 
 
-__all__ = ["Base", "Session", "engine", "init_db", "get_session"]
+__all__ = ["Base", "Session", "get_engine", "init_db", "get_session"]
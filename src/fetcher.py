@@ -1,6 +1,6 @@
 """Fetch card data and prices from TCGdex (primary) or pokemontcg.io (fallback)."""
 import time
-from datetime import date
+from datetime import date, timedelta
 from typing import Optional
 from pathlib import Path
 
@@ -13,7 +13,11 @@ from config.settings import (
     TCGDEX_BASE_URL,
 )
 from src.db import get_session, init_db
+from src.alerts import evaluate_alerts
+from src.broker import price_broker
 from src.models import Card, PriceSnapshot
+from src.search import index_card
+from src.storage import is_delta, latest_snapshots, unchanged
 
 
 def _normalize_tcgdex_to_internal(tcgdex: dict) -> dict:
@@ -211,7 +215,8 @@ def _upsert_card(session, card_data: dict) -> Card:
     img = d.get("image") or (d.get("images") or {}).get("large") or (d.get("images") or {}).get("small")
     card.image_url = img or None
     card.updated_at = date.today()
-    session.merge(card)
+    card = session.merge(card)
+    index_card(session, card)
     return card
 
 
@@ -262,6 +267,36 @@ def _parse_cardmarket_prices(prices: dict) -> list[dict]:
     return rows
 
 
+def _price_update(session, card_id: str, snaps: list) -> dict:
+    """Live-feed event for one card: today's prices plus change vs the previous snapshot per variant/source."""
+    today = date.today()
+    changes = []
+    for s in snaps:
+        prev = (
+            session.query(PriceSnapshot.market)
+            .filter(
+                PriceSnapshot.card_id == card_id,
+                PriceSnapshot.variant == s.variant,
+                PriceSnapshot.source == s.source,
+                PriceSnapshot.snapshot_date < today,
+            )
+            .order_by(PriceSnapshot.snapshot_date.desc())
+            .first()
+        )
+        prev_market = prev[0] if prev else None
+        changes.append({
+            "variant": s.variant,
+            "source": s.source,
+            "market": s.market,
+            "low": s.low,
+            "mid": s.mid,
+            "high": s.high,
+            "prev_market": prev_market,
+            "change": round(s.market - prev_market, 2) if s.market is not None and prev_market is not None else None,
+        })
+    return {"card_id": card_id, "date": today.isoformat(), "prices": changes}
+
+
 def save_card_prices(card_id: str, card_data: dict) -> int:
     """Persist card catalog + price snapshots. Returns count of price rows saved."""
     session = get_session()
@@ -269,7 +304,10 @@ def save_card_prices(card_id: str, card_data: dict) -> int:
         _upsert_card(session, card_data)
 
         rows_saved = 0
+        written = []
         today = date.today()
+        # Delta storage: skip rows whose values match the series' previous snapshot
+        previous = latest_snapshots(session, card_id, today - timedelta(days=1)) if is_delta() else None
 
         # TCGPlayer prices
         tcg = card_data.get("tcgplayer", {}) or {}
@@ -281,6 +319,8 @@ def save_card_prices(card_id: str, card_data: dict) -> int:
                 PriceSnapshot.variant == r["variant"],
                 PriceSnapshot.source == r["source"],
             ).delete()
+            if previous is not None and unchanged(previous.get((r["variant"], r["source"])), r):
+                continue
             snap = PriceSnapshot(
                 card_id=card_id,
                 snapshot_date=r["snapshot_date"],
@@ -296,6 +336,7 @@ def save_card_prices(card_id: str, card_data: dict) -> int:
                 avg_30=r["avg_30"],
             )
             session.add(snap)
+            written.append(snap)
             rows_saved += 1
 
         # CardMarket prices
@@ -308,6 +349,8 @@ def save_card_prices(card_id: str, card_data: dict) -> int:
                 PriceSnapshot.variant == r["variant"],
                 PriceSnapshot.source == r["source"],
             ).delete()
+            if previous is not None and unchanged(previous.get((r["variant"], r["source"])), r):
+                continue
             snap = PriceSnapshot(
                 card_id=card_id,
                 snapshot_date=r["snapshot_date"],
@@ -323,9 +366,18 @@ def save_card_prices(card_id: str, card_data: dict) -> int:
                 avg_30=r["avg_30"],
             )
             session.add(snap)
+            written.append(snap)
             rows_saved += 1
 
+        # Evaluate alert rules for this card only, against the rows just written
+        session.flush()
+        evaluate_alerts(session, card_id)
+
+        update = _price_update(session, card_id, written) if price_broker.has_subscribers(card_id) else None
         session.commit()
+        # Delta storage writes nothing when prices are unchanged; don't push empty events
+        if update and update["prices"]:
+            price_broker.publish(card_id, update)
         return rows_saved
     except Exception as e:
         session.rollback()
@@ -334,9 +386,10 @@ def save_card_prices(card_id: str, card_data: dict) -> int:
         session.close()
 
 
-def run_fetch(watchlist_path: Optional[Path] = None, debug: bool = False) -> int:
+def run_fetch(watchlist_path: Optional[Path] = None, debug: bool = False, prefetch_new_images: bool = True) -> int:
     """
     Load watchlist, fetch all cards, save to DB.
+    Cards new to the catalog get their images cached in a background thread.
     Returns number of cards processed.
     """
     import json
@@ -362,8 +415,16 @@ def run_fetch(watchlist_path: Optional[Path] = None, debug: bool = False) -> int
         if card_names:
             print(f"Watchlist names (search fallback): {card_names}")
     cards = fetch_watchlist(card_ids, card_names=card_names, debug=debug)
+    session = get_session()
+    try:
+        known = {cid for (cid,) in session.query(Card.id).all()}
+    finally:
+        session.close()
     saved = 0
     for c in cards:
         save_card_prices(c["id"], c)
         saved += 1
+    if prefetch_new_images:
+        from src.images import prefetch_images_in_background
+        prefetch_images_in_background([c["id"] for c in cards if c["id"] not in known], debug=debug)
     return saved
@@ -0,0 +1,180 @@
+"""Card image cache: fetch card art once, keep it under data/images, serve resized WebP variants."""
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from config.settings import IMAGE_CACHE_DIR
+from src.db import get_session
+from src.models import Card
+
+# Longest edge in pixels for each resized variant
+IMAGE_SIZES = {"thumb": 160, "small": 320}
+# Don't retry upstream for a card whose art wasn't found for this long
+MISSING_RETRY_SECONDS = 24 * 3600
+
+_CONTENT_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp"}
+
+
+def card_image_url(card: Card) -> Optional[str]:
+    """Return image URL from DB, or derive TCGdex URL when null. TCGdex hosts free card art."""
+    if card.image_url:
+        return card.image_url
+    # Fallback: TCGdex URL pattern https://assets.tcgdex.net/en/{series}/{set_id}/{number}
+    # e.g. swsh4-25 -> swsh/swsh4/25, base1-4 -> base/base1/4
+    if card.set_id and card.number:
+        series = re.match(r"^([a-zA-Z]+)", card.set_id)
+        if series:
+            base = f"https://assets.tcgdex.net/en/{series.group(1)}/{card.set_id}/{card.number}"
+            return base
+    return None
+
+
+def _candidate_urls(url: str) -> list[str]:
+    """TCGdex image URLs are a base without extension; the file lives at {base}/high.png."""
+    if Path(url.split("?")[0]).suffix.lower() in _CONTENT_TYPES:
+        return [url]
+    return [f"{url}/high.png", f"{url}/low.png", f"{url}/high.webp"]
+
+
+def _safe_name(card_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", card_id)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _image_ext(head: bytes) -> Optional[str]:
+    """File extension from an image's magic bytes, or None if it isn't PNG/JPEG/WebP."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def content_type(path: Path) -> str:
+    return _CONTENT_TYPES.get(path.suffix.lower(), "application/octet-stream")
+
+
+def original_path(card_id: str) -> Optional[Path]:
+    """Cached original for card_id, if already downloaded."""
+    for p in (IMAGE_CACHE_DIR / "original").glob(f"{_safe_name(card_id)}.*"):
+        if p.suffix.lower() in _CONTENT_TYPES:
+            return p
+    return None
+
+
+def _missing_marker(card_id: str) -> Path:
+    return IMAGE_CACHE_DIR / "original" / f"{_safe_name(card_id)}.missing"
+
+
+def fetch_original(card: Card) -> Optional[Path]:
+    """Download the card's art into the cache (once). Returns the cached path or None."""
+    cached = original_path(card.id)
+    if cached:
+        with open(cached, "rb") as f:
+            if _image_ext(f.read(12)):
+                return cached
+        cached.unlink(missing_ok=True)  # Not an image (e.g. an HTML error page cached earlier); refetch
+    url = card_image_url(card)
+    if not url:
+        return None
+    missing = _missing_marker(card.id)
+    if missing.exists() and time.time() - missing.stat().st_mtime < MISSING_RETRY_SECONDS:
+        return None
+    import requests  # Only needed on a cache miss; keeps it out of API startup
+
+    for candidate in _candidate_urls(url):
+        try:
+            r = requests.get(candidate, timeout=15)
+        except requests.exceptions.RequestException:
+            continue
+        if r.status_code != 200:
+            continue
+        # Trust the bytes, not the URL or headers: CDNs answer some misses with a 200 HTML page
+        ext = _image_ext(r.content[:12])
+        if not ext:
+            continue
+        path = IMAGE_CACHE_DIR / "original" / f"{_safe_name(card.id)}{ext}"
+        _write_atomic(path, r.content)
+        missing.unlink(missing_ok=True)
+        return path
+    # Remember the miss so broken fallback URLs aren't re-requested on every page load
+    _write_atomic(missing, b"")
+    return None
+
+
+def resized_path(card: Card, size: str) -> Optional[Path]:
+    """
+    Path to a resized WebP variant, generating it from the cached original on first use.
+    Falls back to the original when Pillow isn't installed.
+    """
+    original = fetch_original(card)
+    if not original or size not in IMAGE_SIZES:
+        return original
+    path = IMAGE_CACHE_DIR / size / f"{_safe_name(card.id)}.webp"
+    if path.exists() and path.stat().st_mtime >= original.stat().st_mtime:
+        return path
+    try:
+        from PIL import Image, UnidentifiedImageError
+    except ImportError:
+        return original
+    try:
+        with Image.open(original) as im:
+            im.thumbnail((IMAGE_SIZES[size], IMAGE_SIZES[size]))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            os.close(fd)
+            im.save(tmp, format="WEBP", quality=80)
+            os.replace(tmp, path)
+    except (UnidentifiedImageError, OSError):
+        # Corrupt or truncated original: drop it and back off like any other miss
+        original.unlink(missing_ok=True)
+        _write_atomic(_missing_marker(card.id), b"")
+        return None
+    return path
+
+
+def prefetch_images(card_ids: list[str], debug: bool = False) -> int:
+    """Warm the cache (original + every size) for these cards. Returns count cached."""
+    session = get_session()
+    try:
+        cards = session.query(Card).filter(Card.id.in_(card_ids)).all() if card_ids else []
+        session.expunge_all()
+    finally:
+        session.close()
+    done = 0
+    for card in cards:
+        try:
+            if not fetch_original(card):
+                if debug:
+                    print(f"  image {card.id}: not available")
+                continue
+            for size in IMAGE_SIZES:
+                resized_path(card, size)
+            done += 1
+        except Exception as e:
+            if debug:
+                print(f"  image {card.id}: ERROR - {e}")
+    return done
+
+
+def prefetch_images_in_background(card_ids: list[str], debug: bool = False) -> Optional[threading.Thread]:
+    """Run prefetch_images in a non-daemon thread: API requests return immediately,
+    and scripts/run_fetch.py still waits for it before exiting."""
+    if not card_ids:
+        return None
+    t = threading.Thread(target=prefetch_images, args=(list(card_ids), debug), name="image-prefetch")
+    t.start()
+    return t
@@ -1,6 +1,6 @@
 """SQLAlchemy models for cards and price history."""
 from datetime import date
-from sqlalchemy import Column, Date, Float, Integer, String, UniqueConstraint
+from sqlalchemy import Boolean, Column, Date, DateTime, Float, Index, Integer, String, UniqueConstraint
 
 from src.db import Base
 
@@ -40,4 +40,46 @@ class PriceSnapshot(Base):
 
     __table_args__ = (
         UniqueConstraint("card_id", "snapshot_date", "variant", "source", name="uq_snapshot"),
+        # Series order: lets "last row per series before a date" (forward-fill seeds) stream without a sort
+        Index("ix_snapshot_series", "card_id", "variant", "source", "snapshot_date"),
     )
+
+
+class Holding(Base):
+    """Portfolio position. One row per lot (card, variant, quantity bought at a cost on a date)."""
+    __tablename__ = "holdings"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    card_id = Column(String(64), nullable=False, index=True)
+    variant = Column(String(32))  # null = use preferred variant (see src/portfolio.py)
+    quantity = Column(Integer, nullable=False, default=1)
+    cost_basis = Column(Float)  # Price paid per unit
+    acquired_date = Column(Date)
+
+
+class AlertRule(Base):
+    """User-defined price alert on one card. See src/alerts.py for the rule kinds."""
+    __tablename__ = "alert_rules"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    card_id = Column(String(64), nullable=False, index=True)
+    kind = Column(String(32), nullable=False)  # price_above, price_below, pct_move, spread, below_avg30
+    threshold = Column(Float, nullable=False, default=0)  # Price, or percent for pct_move/spread/below_avg30
+    days = Column(Integer)  # Lookback for pct_move
+    variant = Column(String(32))  # null = any variant
+    source = Column(String(32))  # null = any source
+    triggered = Column(Boolean, nullable=False, default=False)  # Fires once per crossing, re-arms when false
+    created_at = Column(DateTime)
+
+
+class AlertEvent(Base):
+    """A fired alert. Append-only; the SSE stream tails this table by id."""
+    __tablename__ = "alert_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    rule_id = Column(Integer, nullable=False, index=True)
+    card_id = Column(String(64), nullable=False)
+    kind = Column(String(32), nullable=False)
+    value = Column(Float)
+    message = Column(String(256))
+    fired_at = Column(DateTime, nullable=False)
@@ -0,0 +1,271 @@
+"""Opt-in request profiling: latency histograms, per-request query counts, slow-query plans and
+a sampling profiler. Enabled with PERF_INSTRUMENTATION=1; when off, nothing here is installed.
+"""
+import contextvars
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config.settings import PERF_SLOW_QUERY_MS, PROFILE_DIR
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+SAMPLE_INTERVAL_SECONDS = 0.001
+SLOW_QUERY_LOG_SIZE = 50
+UNMATCHED_ROUTE = "<unmatched>"  # One key for every path no route matched (404 scans), so routes stays bounded
+# Innermost frames that mean a thread is idle (worker waiting for a job, event loop waiting on IO)
+_IDLE_FRAMES = {"wait", "select", "poll", "_worker", "accept"}
+
+
+class _RequestStats:
+    """Per-request counters. A mutable object in a contextvar, so threadpool endpoints share it."""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_ms = 0.0
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("perf_request", default=None)
+_in_explain: contextvars.ContextVar = contextvars.ContextVar("perf_in_explain", default=False)
+
+
+class _RouteStats:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.query_ms = 0.0
+
+    def add(self, ms: float, stats: _RequestStats) -> None:
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.queries += stats.queries
+        self.max_queries = max(self.max_queries, stats.queries)
+        self.query_ms += stats.query_ms
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+
+    def _quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound containing quantile q."""
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= target:
+                return bound if bound != float("inf") else round(self.max_ms, 1)
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else None,
+            "p50_ms": self._quantile(0.5),
+            "p95_ms": self._quantile(0.95),
+            "p99_ms": self._quantile(0.99),
+            "max_ms": round(self.max_ms, 2),
+            "queries_per_request": round(self.queries / self.count, 1) if self.count else None,
+            "max_queries": self.max_queries,
+            "query_ms_per_request": round(self.query_ms / self.count, 2) if self.count else None,
+            "histogram_ms": {
+                ("inf" if b == float("inf") else str(b)): n for b, n in zip(LATENCY_BUCKETS_MS, self.buckets)
+            },
+        }
+
+
+class PerfRecorder:
+    def __init__(self):
+        self.routes: dict = {}
+        self.streams: dict = {}  # route -> SSE responses served; their connection lifetime isn't latency
+        self.slow_queries: deque = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self.profiles: list = []
+        self.profile_next: Optional[str] = None  # Path prefix of the next request to profile
+        self._lock = threading.Lock()
+
+    def record(self, route: str, ms: float, stats: _RequestStats) -> None:
+        with self._lock:
+            self.routes.setdefault(route, _RouteStats()).add(ms, stats)
+
+    def record_stream(self, route: str) -> None:
+        with self._lock:
+            self.streams[route] = self.streams.get(route, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.routes.clear()
+            self.streams.clear()
+            self.slow_queries.clear()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "routes": {r: s.to_dict() for r, s in sorted(self.routes.items())},
+                "streams": dict(sorted(self.streams.items())),
+                "slow_query_ms": PERF_SLOW_QUERY_MS,
+                "slow_queries": list(self.slow_queries),
+                "profile_armed_for": self.profile_next,
+                "profiles": [p.name for p in self.profiles],
+            }
+
+
+recorder = PerfRecorder()
+
+
+# -- SQLAlchemy hooks -----------------------------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("perf_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    ms = (time.perf_counter() - conn.info["perf_start"].pop()) * 1000
+    if _in_explain.get():
+        return
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_ms += ms
+    if ms >= PERF_SLOW_QUERY_MS:
+        entry = {"ms": round(ms, 1), "statement": statement, "plan": None}
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            token = _in_explain.set(True)
+            try:
+                rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+                entry["plan"] = [r[-1] for r in rows]
+            except Exception as e:
+                entry["plan"] = [f"EXPLAIN failed: {e}"]
+            finally:
+                _in_explain.reset(token)
+        recorder.slow_queries.append(entry)
+
+
+# -- Sampling profiler ----------------------------------------------------------------------------
+
+class _Sampler(threading.Thread):
+    """Samples every busy thread's Python stack into collapsed "a;b;c count" lines
+    (flamegraph.pl / speedscope / inferno compatible)."""
+
+    def __init__(self):
+        super().__init__(name="perf-sampler", daemon=True)
+        self.counts: dict = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_event.wait(SAMPLE_INTERVAL_SECONDS):
+            for tid, frame in sys._current_frames().items():
+                if tid == me or frame.f_code.co_name in _IDLE_FRAMES:
+                    continue
+                stack = []
+                f = frame
+                while f is not None:
+                    stack.append(f"{f.f_code.co_name} ({Path(f.f_code.co_filename).name}:{f.f_code.co_firstlineno})")
+                    f = f.f_back
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stop(self) -> str:
+        self._stop_event.set()
+        self.join()
+        return "\n".join(f"{k} {v}" for k, v in sorted(self.counts.items())) + "\n"
+
+
+def _save_profile(path: str, folded: str) -> Path:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}{path.replace('/', '_')}.folded"
+    out = PROFILE_DIR / name
+    out.write_text(folded)
+    recorder.profiles.append(out)
+    return out
+
+
+# -- ASGI middleware ------------------------------------------------------------------------------
+
+class PerfMiddleware:
+    """
+    Times each HTTP request and attributes it to its route template (e.g. /api/prices/{card_id}).
+    Server-Sent Events responses are only counted: their duration is how long the client stayed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/debug/perf"):
+            await self.app(scope, receive, send)
+            return
+        stats = _RequestStats()
+        token = _current.set(stats)
+        sampler = None
+        armed = recorder.profile_next
+        if armed and scope["path"].startswith(armed):
+            recorder.profile_next = None
+            sampler = _Sampler()
+            sampler.start()
+        event_stream = False
+
+        async def send_checked(message):
+            nonlocal event_stream
+            if message["type"] == "http.response.start":
+                event_stream = any(
+                    k.lower() == b"content-type" and v.startswith(b"text/event-stream")
+                    for k, v in message.get("headers", ())
+                )
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_checked)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            _current.reset(token)
+            path = getattr(scope.get("route"), "path", None)
+            key = f"{scope['method']} {path}" if path else UNMATCHED_ROUTE
+            if event_stream:
+                recorder.record_stream(key)
+            else:
+                recorder.record(key, ms, stats)
+            if sampler:
+                _save_profile(scope["path"], sampler.stop())
+
+
+def install(app) -> None:
+    """Attach middleware, SQLAlchemy hooks and /debug/perf endpoints to the app."""
+    from fastapi import HTTPException
+    from fastapi.responses import PlainTextResponse
+
+    app.add_middleware(PerfMiddleware)
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.get("/debug/perf")
+    def get_perf(reset: bool = False):
+        """Latency histograms and query counts per route, recent slow queries with plans, saved profiles."""
+        data = recorder.to_dict()
+        if reset:
+            recorder.reset()
+        return data
+
+    @app.post("/debug/perf/profile")
+    def arm_profile(path: str):
+        """Profile the next request whose path starts with `path`. Result appears under profiles."""
+        recorder.profile_next = path
+        return {"status": "ok", "armed_for": path}
+
+    @app.get("/debug/perf/profiles/{name}")
+    def get_profile(name: str):
+        """Download a collapsed-stack profile (feed to flamegraph.pl or speedscope.app)."""
+        for p in recorder.profiles:
+            if p.name == name:
+                return PlainTextResponse(p.read_text())
+        raise HTTPException(status_code=404, detail="Profile not found")
@@ -0,0 +1,152 @@
+"""Portfolio valuation: value holdings against the in-memory price cube with vectorized math.
+
+Prices come from src/cube.py rather than SQL, so valuing thousands of lots over years of history
+doesn't materialize millions of rows. The cube tops up from SQLite after each API refresh and at
+most PRICE_CUBE_MAX_AGE_SECONDS after writes from other processes (scripts/run_fetch.py).
+"""
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from config.settings import PRICE_CUBE_MAX_AGE_SECONDS
+from src.cube import get_cube
+from src.storage import SOURCES, VARIANTS
+
+# Preference when a holding doesn't pin a variant/source. Earlier = preferred.
+SOURCE_PREFERENCE = SOURCES
+VARIANT_PREFERENCE = VARIANTS
+
+_HOLDINGS_SQL = text(
+    "SELECT id AS holding_id, card_id, variant AS want_variant, quantity, cost_basis, acquired_date "
+    "FROM holdings"
+)
+
+
+def _choose_series(holdings: pd.DataFrame, available: pd.DataFrame, source: Optional[str]) -> np.ndarray:
+    """Return, per holding, the column index of its best (variant, source) price series, or -1."""
+    cand = holdings[["holding_id", "card_id", "want_variant"]].merge(available, on="card_id")
+    cand = cand[cand["want_variant"].isna() | (cand["want_variant"] == cand["variant"])]
+    if source:
+        cand = cand[cand["source"] == source]
+    cand = cand.assign(
+        source_rank=cand["source"].map({s: i for i, s in enumerate(SOURCE_PREFERENCE)}).fillna(len(SOURCE_PREFERENCE)),
+        variant_rank=cand["variant"].map({v: i for i, v in enumerate(VARIANT_PREFERENCE)}).fillna(len(VARIANT_PREFERENCE)),
+    )
+    best = cand.sort_values(["holding_id", "source_rank", "variant_rank"]).drop_duplicates("holding_id")
+    chosen = holdings[["holding_id"]].merge(best[["holding_id", "col"]], on="holding_id", how="left")
+    return chosen["col"].fillna(-1).astype(int).to_numpy()
+
+
+def value_portfolio(session, days: int = 0, source: Optional[str] = None) -> dict:
+    """
+    Value every holding for each day in the last `days` days (0 = today only).
+    Prices are forward-filled over missing days. Returns a dict with:
+      dates: DatetimeIndex, value/cost: arrays per date (priced lots only),
+      holdings: DataFrame with current price, value and unrealized P&L per lot.
+    """
+    today = date.today()
+    window_start = today - timedelta(days=days)
+    holdings = pd.read_sql(_HOLDINGS_SQL, session.connection(), parse_dates=["acquired_date"])
+    dates = pd.date_range(window_start, today, freq="D")
+
+    # Pick one series per lot from the cube's series index, then pull just those rows
+    cube = get_cube(session, max_age_seconds=PRICE_CUBE_MAX_AGE_SECONDS)
+    available = cube.series_for_cards(holdings["card_id"].unique())
+    available["col"] = np.arange(len(available))
+    cols = _choose_series(holdings, available, source)
+    used = np.unique(cols[cols >= 0])
+    prices = cube.daily_values(available["row"].to_numpy()[used], window_start, today, fields=("market", "mid"))
+
+    # Trailing NaN row so holdings without any price series index into "no price"
+    matrix = np.vstack([prices, np.full((1, len(dates)), np.nan)])
+    index = np.full(len(available) + 1, len(used))
+    index[used] = np.arange(len(used))
+    unit_prices = matrix[index[cols]].T  # (dates, holdings); cols == -1 picks the NaN row
+
+    qty = holdings["quantity"].fillna(0).to_numpy(dtype=float)
+    unit_cost = holdings["cost_basis"].fillna(0).to_numpy(dtype=float)
+    acquired = holdings["acquired_date"].fillna(pd.Timestamp.min).to_numpy()
+    held = dates.to_numpy()[:, None] >= acquired[None, :]
+
+    # Lots without a price on a given day are left out of that day's cost too, so a card with no
+    # price data doesn't show up as a -100% loss
+    priced = held & ~np.isnan(unit_prices)
+    value = np.nansum(unit_prices * qty * priced, axis=1)
+    cost = (unit_cost * qty * priced).sum(axis=1)
+
+    current = unit_prices[-1]
+    lots = holdings.assign(
+        variant=available["variant"].reindex(cols).to_numpy(),
+        source=available["source"].reindex(cols).to_numpy(),
+        price=current,
+        value=current * qty,
+        cost=unit_cost * qty,
+    )
+    lots["pnl"] = lots["value"] - lots["cost"]
+    return {"dates": dates, "value": value, "cost": cost, "holdings": lots}
+
+
+def _nums(col: pd.Series) -> list:
+    """Column -> list of floats rounded to cents, None where missing (JSON-safe)."""
+    values = np.round(col.to_numpy(dtype=float), 2)
+    return np.where(np.isnan(values), None, values.astype(object)).tolist()
+
+
+def _strs(col: pd.Series) -> list:
+    values = col.to_numpy(dtype=object)
+    return np.where(pd.isna(values), None, values).tolist()
+
+
+def portfolio_summary(session, source: Optional[str] = None) -> dict:
+    """Current value, cost and unrealized P&L, per lot and in total. Totals cover priced lots only;
+    lots with no price data are counted under unpriced_lots / unpriced_cost."""
+    v = value_portfolio(session, days=0, source=source)
+    lots = v["holdings"]
+    priced = lots["price"].notna()
+    total_value = float(lots.loc[priced, "value"].sum())
+    total_cost = float(lots.loc[priced, "cost"].sum())
+    return {
+        "total_value": round(total_value, 2),
+        "total_cost": round(total_cost, 2),
+        "unrealized_pnl": round(total_value - total_cost, 2),
+        "unpriced_lots": int((~priced).sum()),
+        "unpriced_cost": round(float(lots.loc[~priced, "cost"].sum()), 2),
+        "holdings": [
+            {
+                "id": hid,
+                "card_id": card_id,
+                "variant": variant,
+                "source": src,
+                "quantity": qty,
+                "cost_basis": cost_basis,
+                "acquired_date": acquired,
+                "price": price,
+                "value": value,
+                "unrealized_pnl": pnl,
+            }
+            for hid, card_id, variant, src, qty, cost_basis, acquired, price, value, pnl in zip(
+                lots["holding_id"].astype(int).tolist(),
+                lots["card_id"].tolist(),
+                _strs(lots["variant"]),
+                _strs(lots["source"]),
+                lots["quantity"].astype(int).tolist(),
+                _nums(lots["cost_basis"]),
+                _strs(lots["acquired_date"].dt.strftime("%Y-%m-%d")),
+                _nums(lots["price"]),
+                _nums(lots["value"]),
+                _nums(lots["pnl"]),
+            )
+        ],
+    }
+
+
+def portfolio_history(session, days: int = 90, source: Optional[str] = None) -> list[dict]:
+    """Daily portfolio value, cost basis and unrealized P&L for the last `days` days."""
+    v = value_portfolio(session, days=days, source=source)
+    return [
+        {"date": d.date().isoformat(), "value": round(float(val), 2), "cost": round(float(c), 2), "unrealized_pnl": round(float(val - c), 2)}
+        for d, val, c in zip(v["dates"], v["value"], v["cost"])
+    ]
@@ -0,0 +1,150 @@
+"""Local card search: SQLite FTS5 index over the catalog plus trigram fuzzy matching."""
+import re
+import unicodedata
+from typing import Optional
+
+from sqlalchemy import func, text
+
+from src.models import Card
+
+FTS_TABLE = "cards_fts"
+FUZZY_MIN_SCORE = 0.3
+
+# Trigram sets per card, rebuilt only when the FTS index changes (see _catalog_signature)
+_trigram_cache: dict = {"signature": None, "rows": []}
+
+
+def _normalize(s: Optional[str]) -> str:
+    """Lowercase and strip accents so 'Pokémon' matches 'pokemon'."""
+    if not s:
+        return ""
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return s.lower().strip()
+
+
+def _trigrams(s: str) -> set:
+    s = f"  {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def create_search_index(conn) -> None:
+    """Create the FTS5 table if missing and fill it from `cards`. Safe to call on every init_db()."""
+    exists = conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type='table' AND name=:n"), {"n": FTS_TABLE}
+    ).first()
+    if exists:
+        return
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        "card_id UNINDEXED, name, set_name, rarity, number, "
+        "tokenize='unicode61 remove_diacritics 2')"
+    ))
+    conn.execute(text(
+        f"INSERT INTO {FTS_TABLE} (card_id, name, set_name, rarity, number) "
+        "SELECT id, name, COALESCE(set_name, ''), COALESCE(rarity, ''), COALESCE(number, '') FROM cards"
+    ))
+
+
+def index_card(session, card: Card) -> None:
+    """Insert or replace one card in the FTS index. Called from _upsert_card in the same transaction."""
+    try:
+        session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE card_id = :id"), {"id": card.id})
+        session.execute(
+            text(
+                f"INSERT INTO {FTS_TABLE} (card_id, name, set_name, rarity, number) "
+                "VALUES (:id, :name, :set_name, :rarity, :number)"
+            ),
+            {
+                "id": card.id,
+                "name": card.name or "",
+                "set_name": card.set_name or "",
+                "rarity": card.rarity or "",
+                "number": card.number or "",
+            },
+        )
+    except Exception:
+        pass  # SQLite built without FTS5; search falls back to fuzzy matching
+
+
+def _fts_query(q: str) -> str:
+    """Turn user input into an FTS5 prefix query: 'char vmax' -> '"char"* "vmax"*'."""
+    tokens = re.findall(r"\w+", _normalize(q))
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def _search_fts(session, q: str, limit: int) -> list[str]:
+    match = _fts_query(q)
+    if not match:
+        return []
+    try:
+        rows = session.execute(
+            text(
+                f"SELECT card_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q "
+                # Weight name hits above set/rarity/number hits
+                f"ORDER BY bm25({FTS_TABLE}, 0, 10.0, 2.0, 1.0, 5.0) LIMIT :limit"
+            ),
+            {"q": match, "limit": limit},
+        ).fetchall()
+    except Exception:
+        return []
+    return [r[0] for r in rows]
+
+
+def _catalog_signature(session):
+    try:
+        return tuple(session.execute(text(f"SELECT max(rowid), count(*) FROM {FTS_TABLE}")).first())
+    except Exception:
+        return tuple(session.execute(text("SELECT count(*), max(updated_at) FROM cards")).first())
+
+
+def _fuzzy_rows(session) -> list[tuple]:
+    sig = _catalog_signature(session)
+    if _trigram_cache["signature"] != sig:
+        rows = []
+        for card_id, name, number in session.query(Card.id, Card.name, Card.number).all():
+            norm = _normalize(name)
+            rows.append((card_id, norm, _trigrams(norm), _normalize(number)))
+        _trigram_cache["rows"] = rows
+        _trigram_cache["signature"] = sig
+    return _trigram_cache["rows"]
+
+
+def _search_fuzzy(session, q: str, limit: int, exclude: set) -> list[str]:
+    """Typo-tolerant match: trigram similarity (Dice) between query and card name."""
+    nq = _normalize(q)
+    qgrams = _trigrams(nq)
+    if not qgrams:
+        return []
+    scored = []
+    for card_id, name, grams, number in _fuzzy_rows(session):
+        if card_id in exclude:
+            continue
+        score = 2 * len(qgrams & grams) / (len(qgrams) + len(grams))
+        if number and number in nq.split():
+            score += 0.1
+        if score >= FUZZY_MIN_SCORE:
+            scored.append((score, card_id))
+    scored.sort(key=lambda x: -x[0])
+    return [card_id for _, card_id in scored[:limit]]
+
+
+def search_cards(session, q: str, limit: int = 10) -> list[Card]:
+    """Ranked local search: FTS5 prefix hits first, then fuzzy matches to fill up to `limit`."""
+    ids = _search_fts(session, q, limit)
+    if len(ids) < limit:
+        ids += _search_fuzzy(session, q, limit - len(ids), exclude=set(ids))
+    if not ids:
+        return []
+    by_id = {c.id: c for c in session.query(Card).filter(Card.id.in_(ids)).all()}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def resolve_card_name(session, name: str) -> Optional[Card]:
+    """Find a catalog card whose name matches exactly (case-insensitive). None if unknown locally."""
+    return (
+        session.query(Card)
+        .filter(func.lower(Card.name) == name.strip().lower())
+        .order_by(Card.updated_at.desc())
+        .first()
+    )
@@ -0,0 +1,120 @@
+"""Snapshot storage modes.
+
+full  (default): one price_snapshots row per card/variant/source per refresh day.
+delta: a row is only written when any price value differs from the series' previous row.
+       Readers forward-fill to rebuild the daily series, up to the card's last refresh
+       (cards.updated_at). scripts/compact_db.py converts existing full history.
+       Limitation: nothing records that a variant/source stopped being listed, so a discontinued
+       series is forward-filled with its last price up to cards.updated_at. (The price cube and
+       portfolio already forward-fill a series that stops in full mode too.)
+"""
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, func, or_, select, text, tuple_
+
+from config.settings import SNAPSHOT_STORAGE
+from src.models import PriceSnapshot
+
+VALUE_FIELDS = ("low", "mid", "high", "market", "direct_low", "avg_1", "avg_7", "avg_30")
+SOURCES = ("tcgplayer", "cardmarket")  # Price sources, preferred first (TCGplayer USD, CardMarket EUR)
+# Variant keys live refreshes store (TCGplayer price keys); the backfill maps export spellings onto them
+VARIANTS = ("normal", "holofoil", "reverseHolofoil", "1stEditionHolofoil", "1stEditionNormal", "unlimitedHolofoil")
+
+
+def is_delta() -> bool:
+    return SNAPSHOT_STORAGE == "delta"
+
+
+def unchanged(prev: Optional[PriceSnapshot], row: dict) -> bool:
+    """True if a parsed price row carries exactly the values of the series' previous snapshot."""
+    return prev is not None and all(getattr(prev, f) == row.get(f) for f in VALUE_FIELDS)
+
+
+def latest_snapshots(session, card_id: str, as_of: date) -> dict:
+    """Latest snapshot on or before as_of for each (variant, source) of a card."""
+    latest = (
+        session.query(
+            PriceSnapshot.variant,
+            PriceSnapshot.source,
+            func.max(PriceSnapshot.snapshot_date).label("d"),
+        )
+        .filter(PriceSnapshot.card_id == card_id, PriceSnapshot.snapshot_date <= as_of)
+        .group_by(PriceSnapshot.variant, PriceSnapshot.source)
+        .subquery()
+    )
+    rows = (
+        session.query(PriceSnapshot)
+        .join(
+            latest,
+            and_(
+                PriceSnapshot.variant == latest.c.variant,
+                PriceSnapshot.source == latest.c.source,
+                PriceSnapshot.snapshot_date == latest.c.d,
+            ),
+        )
+        .filter(PriceSnapshot.card_id == card_id)
+        .all()
+    )
+    return {(s.variant, s.source): s for s in rows}
+
+
+def since_with_seed(cutoff: date, card_ids: list[str]):
+    """
+    Filter for rows on/after cutoff plus, per series, the last row before it (to seed forward-fill).
+    The seeds come from one grouped query over `card_ids` (the cards the caller already filters on)
+    rather than a correlated MAX per row.
+    """
+    seeds = (
+        select(PriceSnapshot.card_id, PriceSnapshot.variant, PriceSnapshot.source, func.max(PriceSnapshot.snapshot_date))
+        .where(PriceSnapshot.card_id.in_(card_ids), PriceSnapshot.snapshot_date < cutoff)
+        .group_by(PriceSnapshot.card_id, PriceSnapshot.variant, PriceSnapshot.source)
+    )
+    key = tuple_(PriceSnapshot.card_id, PriceSnapshot.variant, PriceSnapshot.source, PriceSnapshot.snapshot_date)
+    return or_(PriceSnapshot.snapshot_date >= cutoff, key.in_(seeds))
+
+
+def densify(rows: list[dict], end: Optional[date]) -> list[dict]:
+    """
+    Forward-fill price rows (dicts with an ISO "date", ordered by date) into one row per day
+    per (variant, source), from each series' first row through `end`.
+    """
+    by_series: dict = {}
+    for r in rows:
+        by_series.setdefault((r["variant"], r["source"]), []).append(r)
+    out = []
+    for series in by_series.values():
+        last_day = date.fromisoformat(series[-1]["date"])
+        stop = max(end, last_day) if end else last_day
+        for i, r in enumerate(series):
+            day = date.fromisoformat(r["date"])
+            next_day = date.fromisoformat(series[i + 1]["date"]) if i + 1 < len(series) else stop + timedelta(days=1)
+            while day < next_day:
+                out.append({**r, "date": day.isoformat()})
+                day += timedelta(days=1)
+    out.sort(key=lambda r: r["date"])
+    return out
+
+
+_COMPACT_SQL = text(
+    "DELETE FROM price_snapshots WHERE id IN ("
+    " SELECT id FROM ("
+    "  SELECT id, snapshot_date, "
+    + ", ".join(f"{f}, LAG({f}) OVER w AS prev_{f}" for f in VALUE_FIELDS)
+    + ", LAG(snapshot_date) OVER w AS prev_date"
+    "  FROM price_snapshots"
+    "  WINDOW w AS (PARTITION BY card_id, variant, source ORDER BY snapshot_date)"
+    " ) WHERE prev_date IS NOT NULL AND "
+    + " AND ".join(f"{f} IS prev_{f}" for f in VALUE_FIELDS)
+    + ")"
+)
+
+
+def compact_snapshots(engine) -> int:
+    """Delete snapshots identical to the previous row of their series, then VACUUM. Returns rows deleted."""
+    with engine.connect() as conn:
+        deleted = conn.execute(_COMPACT_SQL).rowcount
+        conn.commit()
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+    return deleted